@@ -0,0 +1,80 @@
+import fnmatch
+import json
+import os
+import struct
+
+from buildlib import BUILDDIR, PDIR
+
+from . import build_command, Command
+
+
+@build_command('pack all resources into a single bundle')
+class generate_bundle(Command):
+    # The resources to include, as directories and file name patterns
+    # relative to the package directory
+    SOURCES = (
+        ('', '*.png'),
+        ('html', '*'),
+        ('keyboard/layout', '*'),
+        ('translations', '*'))
+
+    # Files matching these patterns are never included
+    EXCLUDES = ('.gitignore', '*.py', '*.pyc')
+
+    # The bundle to write; this must match
+    # virtualtouchpad.resource.BUNDLE_PATH
+    TARGET = os.path.join(BUILDDIR, 'virtualtouchpad.bundle')
+
+    # The magic bytes and header; these must match
+    # virtualtouchpad.resource.BUNDLE_MAGIC and BUNDLE_HEADER
+    MAGIC = b'VTPBNDL1'
+    HEADER = struct.Struct('<I')
+
+    def run(self):
+        Command.run(self)
+        os.makedirs(os.path.dirname(self.TARGET), exist_ok=True)
+        with open(self.TARGET, 'wb') as f:
+            self.write(f, sorted(self.files()))
+
+    def files(self):
+        """Lists the files to include in the bundle.
+
+        :return: a generator yielding resource paths relative to the package
+            directory, using ``'/'`` as separator
+        """
+        for directory, pattern in self.SOURCES:
+            root = os.path.join(PDIR, directory)
+            for dirpath, dirnames, names in os.walk(root):
+                if not directory:
+                    # Only include files directly in the package directory
+                    dirnames[:] = []
+                for name in names:
+                    if not fnmatch.fnmatch(name, pattern) or any(
+                            fnmatch.fnmatch(name, exclude)
+                            for exclude in self.EXCLUDES):
+                        continue
+                    yield os.path.relpath(
+                        os.path.join(dirpath, name),
+                        PDIR).replace(os.path.sep, '/')
+
+    def write(self, stream, paths):
+        """Writes a bundle.
+
+        :param stream: The stream to which to write.
+
+        :param paths: The resource paths of the files to include.
+        """
+        index = {}
+        offset = 0
+        for path in paths:
+            st = os.stat(os.path.join(PDIR, path))
+            index[path] = [offset, st.st_size, st.st_mtime]
+            offset += st.st_size
+        header = json.dumps(index, sort_keys=True).encode('utf-8')
+
+        stream.write(self.MAGIC)
+        stream.write(self.HEADER.pack(len(header)))
+        stream.write(header)
+        for path in paths:
+            with open(os.path.join(PDIR, path), 'rb') as f:
+                stream.write(f.read())
@@ -0,0 +1,86 @@
+import gzip
+import os
+import sys
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+from buildlib import HTML_ROOT, update_file_time
+
+from . import build_command, Command
+from .minify import minify_html
+
+
+@build_command('generate compressed variants of static files',
+               minify_html)
+class compress_html(Command):
+    # The extensions of files to compress
+    EXTENSIONS = ('.css', '.js', '.min', '.svg', '.xhtml')
+
+    # Files smaller than this are not worth compressing
+    MINIMUM_SIZE = 512
+
+    def run(self):
+        Command.run(self)
+        if brotli is None:
+            sys.stdout.write(
+                'Not generating brotli variants: brotli is not installed\n')
+
+        for dirpath, dirnames, names in os.walk(HTML_ROOT):
+            for name in names:
+                if os.path.splitext(name)[1] in self.EXTENSIONS:
+                    self.compress(os.path.join(dirpath, name))
+
+    def compress(self, path):
+        """Writes compressed variants of a file alongside it.
+
+        A variant is written only if it is smaller than the original.
+
+        :param str path: The file to compress.
+        """
+        with open(path, 'rb') as f:
+            data = f.read()
+        if len(data) < self.MINIMUM_SIZE:
+            return
+
+        self.write(path, path + '.gz', data, _gzip(data))
+        if brotli is not None:
+            self.write(path, path + '.br', data, brotli.compress(data))
+
+    def write(self, source, target, data, compressed):
+        """Writes a compressed variant if it is smaller than the original.
+
+        :param str source: The original file.
+
+        :param str target: The compressed file.
+
+        :param bytes data: The original content.
+
+        :param bytes compressed: The compressed content.
+        """
+        if len(compressed) < len(data):
+            with open(target, 'wb') as f:
+                f.write(compressed)
+            update_file_time(target, source)
+        elif os.path.exists(target):
+            os.unlink(target)
+
+
+def _gzip(data):
+    """Compresses data with *gzip*.
+
+    The timestamp of the archive is cleared to make the output reproducible.
+
+    :param bytes data: The data to compress.
+
+    :return: compressed data
+    """
+    import io
+
+    with io.BytesIO() as stream:
+        with gzip.GzipFile(
+                fileobj=stream, mode='wb', compresslevel=9, mtime=0) as f:
+            f.write(data)
+        return stream.getvalue()
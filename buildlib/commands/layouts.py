@@ -0,0 +1,73 @@
+import json
+import os
+
+from buildlib import PDIR, update_file_time
+
+from . import build_command, Command
+
+
+@build_command('compile keyboard layouts to their compact form')
+class compile_layouts(Command):
+    # The directory containing the layouts
+    LAYOUT_DIR = os.path.join(PDIR, 'keyboard', 'layout')
+
+    # The extension of layout source files
+    EXTENSION = '.layout'
+
+    # The extension appended to compiled layouts
+    COMPACT_EXTENSION = '.min'
+
+    def run(self):
+        Command.run(self)
+        for name in os.listdir(self.LAYOUT_DIR):
+            if name.endswith(self.EXTENSION):
+                self.compile(os.path.join(self.LAYOUT_DIR, name))
+
+    def compile(self, path):
+        """Compiles a single layout file.
+
+        The compiled layout is written alongside the source file.
+
+        :param str path: The layout source file.
+        """
+        target = path + self.COMPACT_EXTENSION
+        with open(path, 'r', encoding='utf-8') as f:
+            layout = json.load(f)
+        with open(target, 'w', encoding='utf-8') as f:
+            json.dump(
+                compact(layout), f,
+                ensure_ascii=False, separators=(',', ':'), sort_keys=True)
+        update_file_time(target, path)
+
+
+def compact(layout):
+    """Converts a layout to its compact form.
+
+    In the compact form, every distinct key name is stored once in the list
+    ``strings``, and every key in ``layout`` is a list of integers, one for
+    each level. An integer is the index of the key name in ``strings``
+    shifted left by one, with the lowest bit set for dead keys.
+
+    :param dict layout: The layout source.
+
+    :return: a compact layout
+    """
+    strings = []
+    indices = {}
+
+    def index(name):
+        try:
+            return indices[name]
+        except KeyError:
+            indices[name] = len(strings)
+            strings.append(name)
+            return indices[name]
+
+    return {
+        'meta': layout['meta'],
+        'strings': strings,
+        'layout': {
+            key: [
+                (index(name) << 1) | (1 if is_dead else 0)
+                for name, is_dead in levels]
+            for key, levels in sorted(layout['layout'].items())}}
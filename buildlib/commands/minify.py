@@ -19,6 +19,7 @@ class minify_html(Command):
                 name))
 
         buildlib.xmltransform.minify_html(dom_context)
+        buildlib.xmltransform.fingerprint(dom_context)
 
         if include_appcache:
             buildlib.xmltransform.add_manifest(
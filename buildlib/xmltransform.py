@@ -1,10 +1,11 @@
+import hashlib
 import os
 import re
 
 from xml.dom import Node
 from xml.dom.minidom import CDATASection
 
-from . import LICENSE, update_file_time, HTML_ROOT
+from . import LICENSE, update_file_time, HTML_ROOT, PDIR
 
 #: Elements that are allowed to be self-closing in XHTML
 _VOID_ELEMENTS = [
@@ -14,6 +15,15 @@ _VOID_ELEMENTS = [
 #: A regular expression to match whitespace
 SPACE_RE = re.compile(r'(?ms)\s+')
 
+# Read globals from virtualtouchpad._fingerprint without loading the package
+_FINGERPRINT = {}
+with open(os.path.join(PDIR, '_fingerprint.py'), 'rb') as f:
+    exec(compile(f.read(), '_fingerprint.py', 'exec'), {}, _FINGERPRINT)
+
+#: The number of hexadecimal digits of the content hash to include in
+#: fingerprinted file names
+FINGERPRINT_LENGTH = _FINGERPRINT['FINGERPRINT_LENGTH']
+
 
 def _src_to_path(source_dir, value):
     """Converts a ``src`` attribute value to an absolute path.
@@ -300,6 +310,49 @@ def minify_html(context):
         files=files)
 
 
+def _fingerprint(e, source_dir, files):
+    """Adds a content hash to the file names of references to static files"""
+    if e.nodeType != Node.ELEMENT_NODE:
+        return
+
+    for attribute in ('href', 'src'):
+        value = e.getAttribute(attribute)
+        if not value or value[0] != '/':
+            continue
+
+        # Only files that are served as static files can be fingerprinted
+        path = _src_to_path(source_dir, value)
+        if not os.path.isfile(path):
+            continue
+        with open(path, 'rb') as f:
+            digest = hashlib.sha1(f.read()).hexdigest()
+
+        base, ext = os.path.splitext(value)
+        e.setAttribute(
+            attribute,
+            '%s.%s%s' % (base, digest[:FINGERPRINT_LENGTH], ext))
+
+        files.append(path)
+
+
+def fingerprint(context):
+    """Adds a content hash to the file names of all references to static files
+    that are not inlined.
+
+    The server strips the content hash when locating the file, and allows
+    clients to cache fingerprinted files indefinitely.
+
+    :param context: The *DOM* context as returned by :func:`start`.
+    """
+    source_path, dom, files = context
+
+    _recurse(
+        dom.documentElement,
+        _fingerprint,
+        source_dir=os.path.dirname(source_path),
+        files=files)
+
+
 def _add_manifest(e, manifest_file):
     """Adds an AppCache manifest to e if it is an html element"""
     # Only handle JavaScript elements
@@ -15,8 +15,10 @@
 # You should have received a copy of the GNU General Public License along with
 # this program. If not, see <http://www.gnu.org/licenses/>.
 
-import http.client
-import sys
+import asyncio
+import signal
+import socket
+import threading
 
 from aiohttp import web
 
@@ -29,45 +31,108 @@ def server(configuration):
 
     :param virtualtouchpad.status.Status configuration: The server
         configuration. This has to include at least ``SERVER_HOST`` and
-        ``SERVER_PORT``.
-
-    :param address: The address on which to listen.
+        ``SERVER_PORT``. The server also listens on ``SERVER_LISTEN`` and
+        ``SERVER_UNIX_SOCKET``, if set.
 
     :return: a server instance
     """
     class Server(object):
         def __init__(self, configuration):
             self.configuration = configuration
+            self.loop = None
+            self._runner = None
+            self._stopping = None
 
         def start(self):
             """Starts the server.
 
-            This method runs until :meth:`stop` is called.
+            This method runs until :meth:`stop` is called. When run on the main
+            thread, ``SIGINT`` and ``SIGTERM`` stop the server gracefully.
             """
             if 'server' in app:
                 raise RuntimeError('only one server allowed')
 
+            # The loop and the stop event must exist before the server is
+            # published, since stop may be called as soon as it is
+            loop = asyncio.new_event_loop()
+            asyncio.set_event_loop(loop)
+            self._stopping = asyncio.Event()
+            self.loop = loop
             app['server'] = self
             try:
-                web.run_app(
-                    app,
-                    host=configuration.SERVER_HOST,
-                    port=configuration.SERVER_PORT)
+                loop.run_until_complete(self._run())
             finally:
                 del app['server']
 
+                # Let tasks running in the default executor, such as rendering
+                # of QR codes, finish before the loop is closed
+                if hasattr(loop, 'shutdown_default_executor'):
+                    loop.run_until_complete(loop.shutdown_default_executor())
+                loop.close()
+
         def stop(self):
             """Stops the server.
+
+            Open *WebSockets* are closed and their handlers are allowed to
+            finish before the application is cleaned up.
+
+            This method may be called from any thread. If the server is still
+            starting, it stops as soon as it has started.
+
+            :raises RuntimeError: if the server has not been started, or has
+                already stopped
             """
-            if 'server' not in app:
+            loop = self.loop
+            if loop is None or loop.is_closed():
                 raise RuntimeError('server is not running')
 
-            app.loop.stop()
+            loop.call_soon_threadsafe(self._stopping.set)
 
-            # TODO: The web application will stall until a conneciton attempt is
-            # made, but this should be possible to solve more elegantly?
-            http.client.HTTPConnection(
-                self.configuration.SERVER_HOST,
-                self.configuration.SERVER_PORT).request('GET', '/')
+        async def _run(self):
+            self._runner = web.AppRunner(app)
+            await self._runner.setup()
+            try:
+                self._handle_signals()
+                await self._listen()
+                await self._stopping.wait()
+            finally:
+                await self._runner.cleanup()
+
+        async def _listen(self):
+            hosts = [self.configuration.SERVER_HOST] + [
+                host
+                for host in self.configuration.SERVER_LISTEN
+                if host != self.configuration.SERVER_HOST]
+            reuse_port = self.configuration.SERVER_REUSE_PORT \
+                and hasattr(socket, 'SO_REUSEPORT')
+
+            sites = [
+                web.TCPSite(
+                    self._runner,
+                    host,
+                    self.configuration.SERVER_PORT,
+                    reuse_port=reuse_port)
+                for host in hosts]
+            if self.configuration.SERVER_UNIX_SOCKET:
+                sites.append(web.UnixSite(
+                    self._runner,
+                    self.configuration.SERVER_UNIX_SOCKET))
+
+            for site in sites:
+                await site.start()
+
+        def _handle_signals(self):
+            if threading.current_thread() is not threading.main_thread():
+                return
+
+            for name, callback in (
+                    ('SIGINT', self._stopping.set),
+                    ('SIGTERM', self._stopping.set)):
+                try:
+                    self.loop.add_signal_handler(
+                        getattr(signal, name), callback)
+                except (AttributeError, NotImplementedError, RuntimeError):
+                    # The signal is not supported on this platform
+                    pass
 
     return Server(configuration)
@@ -26,7 +26,6 @@ from . import resource
 from . import routes
 from . import server
 from . import status
-from . import trayicon
 
 
 # The name of the Virtual Touchpad service
@@ -142,6 +141,66 @@ def _load_configuration(**kwargs):
     return status.Configuration(**kwargs)
 
 
+def _install_uvloop():
+    """Makes *uvloop* the event loop implementation, if it is installed.
+    """
+    try:
+        import asyncio
+        import uvloop
+    except ImportError:
+        log.warning('uvloop is not installed, using the default event loop')
+        return
+
+    asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+
+
+def _run_with_tray(configuration, main_server):
+    """Runs the server with a system tray icon.
+
+    The server is started in a background thread before the system tray icon
+    and its dependencies are loaded, to start accepting connections as soon as
+    possible. The system tray icon runs on the main thread until the server
+    stops.
+
+    Since signals are only delivered to the main thread, ``SIGINT`` and
+    ``SIGTERM`` are handled here and stop the server gracefully.
+
+    :param configuration: The server configuration.
+
+    :param main_server: The server to run.
+    """
+    import os
+    import signal
+    import threading
+
+    from . import trayicon
+
+    def on_signal(signum, frame):
+        try:
+            main_server.stop()
+        except RuntimeError:
+            # The server is not running, so there is nothing to shut down;
+            # terminate as if the signal was not handled
+            signal.signal(signum, signal.SIG_DFL)
+            os.kill(os.getpid(), signum)
+
+    for name in ('SIGINT', 'SIGTERM'):
+        signal.signal(getattr(signal, name), on_signal)
+
+    thread = threading.Thread(target=main_server.start, daemon=True)
+    thread.start()
+
+    icon = trayicon.create(configuration)
+    icon.server = main_server
+
+    def setup(icon):
+        icon.visible = True
+        thread.join()
+        icon.stop()
+
+    icon.run(setup)
+
+
 def start():
     parser = ArgumentParser(
         description='Turns your mobile or tablet into a touchpad for your '
@@ -153,6 +212,48 @@ def start():
         help='The port on which to listen',
         default=16080)
 
+    parser.add_argument(
+        '--listen',
+        type=str,
+        action='append',
+        help='An additional address on which to listen; this may be '
+        'specified several times',
+        default=[])
+
+    parser.add_argument(
+        '--unix-socket',
+        type=str,
+        help='The path of a Unix socket on which to listen, for use with a '
+        'local reverse proxy')
+
+    parser.add_argument(
+        '--reuse-port',
+        action='store_true',
+        help='Allow several processes to listen on the same port, where '
+        'supported')
+
+    parser.add_argument(
+        '--uvloop',
+        action='store_true',
+        help='Use uvloop as event loop, if it is installed')
+
+    parser.add_argument(
+        '--keyboard-layout',
+        type=str,
+        help='The file name of the default keyboard layout')
+
+    parser.add_argument(
+        '--coalesce',
+        action='store_true',
+        help='Merge consecutive mouse movements received together into one '
+        'movement')
+
+    parser.add_argument(
+        '--no-tray',
+        action='store_true',
+        help='Do not display a system tray icon; this is useful on headless '
+        'systems')
+
     parser.add_argument(
         '--log-level',
         type=str,
@@ -165,24 +266,27 @@ def start():
     logging.basicConfig(
         level=getattr(logging, args.log_level.upper()))
 
+    if args.uvloop:
+        _install_uvloop()
+
     address = _get_local_address()
 
     configuration = _load_configuration(**{
         status.Configuration.SERVER_HOST.name: address,
-        status.Configuration.SERVER_PORT.name: args.port})
-
-    icon = trayicon.create(configuration)
+        status.Configuration.SERVER_PORT.name: args.port,
+        status.Configuration.SERVER_LISTEN.name: args.listen,
+        status.Configuration.SERVER_UNIX_SOCKET.name: args.unix_socket,
+        status.Configuration.SERVER_REUSE_PORT.name: args.reuse_port,
+        status.Configuration.CONTROLLER_COALESCE.name: args.coalesce,
+        status.Configuration.KEYBOARD_LAYOUT.name: args.keyboard_layout})
 
     try:
-        def setup(icon):
-            main_server = server(configuration)
-            icon.visible = True
-            icon.server = main_server
-            main_server.start()
-            icon.stop()
-
+        main_server = server(configuration)
         with _announcer(address, args.port):
-            icon.run(setup)
+            if args.no_tray:
+                main_server.start()
+            else:
+                _run_with_tray(configuration, main_server)
     except KeyboardInterrupt:
         log.info('Interrupted, terminating')
     except:
@@ -0,0 +1,5 @@
+# coding=utf-8
+
+#: The number of hexadecimal digits of the content hash included in
+#: fingerprinted file names; this module is also read by the build scripts
+FINGERPRINT_LENGTH = 16
@@ -15,21 +15,126 @@
 # You should have received a copy of the GNU General Public License along with
 # this program. If not, see <http://www.gnu.org/licenses/>.
 
+import asyncio
+import functools
+import inspect
+import itertools
 import logging
+import queue
+import threading
 
 log = logging.getLogger(__name__)
 
 
+#: The attribute set on handler methods by :func:`command`; its value is
+#: whether the command is internal
+COMMAND_ATTRIBUTE = '_dispatcher_command'
+
+
+def command(decorated=None, internal=False):
+    """A decorator to mark a handler method as a command.
+
+    Only methods marked as commands are dispatched by :class:`Dispatcher`.
+
+    :param decorated: The method to decorate. If this is not passed, a
+        decorator is returned.
+
+    :param bool internal: Whether the command is internal. Internal commands
+        are dispatched, but rejected by :meth:`Dispatcher.validate`, so they
+        cannot be invoked by clients.
+    """
+    def inner(method):
+        setattr(method, COMMAND_ATTRIBUTE, internal)
+        return method
+
+    if decorated is not None:
+        return inner(decorated)
+    else:
+        return inner
+
+
+def _arguments(parameters):
+    """Describes the arguments accepted by a callable.
+
+    :param parameters: The parameters of the callable, as returned by
+        :func:`inspect.signature`, not including any ``self`` parameter.
+
+    :return: the tuple ``(required, allowed)``, where ``allowed`` is ``None``
+        if any keyword argument is accepted
+    """
+    parameters = list(parameters)
+    return (
+        frozenset(
+            parameter.name
+            for parameter in parameters
+            if parameter.default is parameter.empty
+            and parameter.kind == parameter.POSITIONAL_OR_KEYWORD),
+        None if any(
+            parameter.kind == parameter.VAR_KEYWORD
+            for parameter in parameters)
+        else frozenset(
+            parameter.name
+            for parameter in parameters
+            if parameter.kind in (
+                parameter.POSITIONAL_OR_KEYWORD,
+                parameter.KEYWORD_ONLY)))
+
+
+@functools.lru_cache(maxsize=None)
+def _table(handler_class):
+    """Builds the command table of a handler class.
+
+    :param type handler_class: The handler class.
+
+    :return: a sequence of the tuple ``(method, internal, arguments)`` for
+        every method marked with :func:`command`, where ``arguments`` is as
+        returned by :func:`_arguments`
+    """
+    return tuple(
+        (
+            name,
+            getattr(member, COMMAND_ATTRIBUTE),
+            _arguments(list(
+                inspect.signature(member).parameters.values())[1:]))
+        for name, member in inspect.getmembers(handler_class, callable)
+        if hasattr(member, COMMAND_ATTRIBUTE))
+
+
 class Dispatcher(object):
     """A class used to dispatch events to event handlers.
     """
     def __init__(self, **handlers):
         """Creates a dispatcher for a collection of handlers.
 
-        :param handlers: The handlers to register. These must be callable, and
-            they will be registered as the key names.
+        :param handlers: The handlers to register, keyed on their names. A
+            callable handler is registered as a command with its name. The
+            methods of a handler marked with :func:`command` are registered as
+            commands on the form ``name.method``. A handler may list the names
+            of methods whose invocations may be merged by :meth:`coalesce` in
+            the attribute ``COALESCABLE``.
         """
         self._handlers = handlers
+        self._commands = {}
+        self._arguments = {}
+        self._internal = set()
+        self._coalescable = {
+            '%s.%s' % (name, method)
+            for name, handler in handlers.items()
+            for method in getattr(handler, 'COALESCABLE', ())}
+
+        # Resolve all commands up front to make dispatching a single lookup;
+        # the command tables are built once per handler class
+        for name, handler in handlers.items():
+            if callable(handler):
+                self._commands[name] = handler
+                self._arguments[name] = _arguments(
+                    inspect.signature(handler).parameters.values())
+            for method, internal, arguments in _table(type(handler)):
+                command = '%s.%s' % (name, method)
+                self._commands[command] = getattr(handler, method)
+                self._arguments[command] = arguments
+                if internal:
+                    self._internal.add(command)
 
     def __call__(self, command, data):
         """Dispatches a command.
@@ -40,17 +145,162 @@ class Dispatcher(object):
 
         :raises KeyError: if ``command`` is an unknown handler
         """
-        try:
-            name, method = command.split('.', 1)
-            handler = getattr(self._handlers[name], method)
-        except ValueError:
-            handler = self._handlers[command]
+        handler = self._commands[command]
 
         try:
             return handler(**data)
         except Exception as e:
             log.exception(
-                'Failed to handle %s(%s): %s' % (
-                    command,
-                    ', '.join('%s=%s' % i for i in data.items()),
-                    str(e)))
+                'Failed to handle %s(%s): %s',
+                command,
+                ', '.join('%s=%s' % i for i in data.items()),
+                str(e))
+
+    def validate(self, command, data):
+        """Verifies that a command can be dispatched.
+
+        :param str command: The command to dispatch.
+
+        :param dict data: The arguments.
+
+        :raises KeyError: if ``command`` is an unknown handler or an internal
+            command
+
+        :raises TypeError: if ``data`` does not match the arguments of the
+            handler
+        """
+        if command in self._internal:
+            raise KeyError(command)
+        required, allowed = self._arguments[command]
+        if not required <= data.keys():
+            raise TypeError('%s requires %s' % (
+                command, ', '.join(sorted(required - data.keys()))))
+        if allowed is not None and not data.keys() <= allowed:
+            raise TypeError('%s does not accept %s' % (
+                command, ', '.join(sorted(data.keys() - allowed))))
+
+    def coalesce(self, commands):
+        """Merges consecutive invocations of coalescable commands.
+
+        Consecutive commands are merged only if they are the same coalescable
+        command and pass the same argument names, in which case the arguments
+        are summed. Commands are never reordered.
+
+        :param commands: A sequence of the tuple ``(command, data)``.
+
+        :return: a generator yielding the tuple ``(command, data)``
+        """
+        pending = None
+        for command, data in commands:
+            if pending is not None \
+                    and pending[0] == command \
+                    and command in self._coalescable \
+                    and pending[1].keys() == data.keys():
+                pending = (command, {
+                    key: value + data[key]
+                    for key, value in pending[1].items()})
+            else:
+                if pending is not None:
+                    yield pending
+                pending = (command, data)
+
+        if pending is not None:
+            yield pending
+
+
+class Worker(object):
+    """A worker thread dispatching commands outside of the event loop.
+
+    Commands are dispatched in the order they are queued.
+    """
+    #: The default maximum number of batches of commands waiting to be
+    #: dispatched
+    QUEUE_SIZE = 64
+
+    def __init__(self, coalesce=False, queue_size=QUEUE_SIZE):
+        """Creates and starts a worker thread.
+
+        :param bool coalesce: Whether to merge coalescable commands using
+            :meth:`Dispatcher.coalesce`. All commands waiting when the worker
+            wakes up are merged.
+
+        :param int queue_size: The maximum number of batches of commands
+            waiting to be dispatched.
+        """
+        self._coalesce = coalesce
+        self._queue = queue.Queue()
+        self._slots = asyncio.Semaphore(queue_size)
+        self._stopped = False
+        self._thread = threading.Thread(
+            target=self._run,
+            name=__name__,
+            daemon=True)
+        self._thread.start()
+
+    async def put(self, dispatch, commands):
+        """Queues a batch of commands.
+
+        If the queue is full, this coroutine waits on the event loop until
+        room is available; if it is cancelled while waiting, nothing is
+        queued.
+
+        Commands queued after :meth:`stop` has been called are logged and
+        dropped.
+
+        :param Dispatcher dispatch: The dispatcher to use.
+
+        :param commands: A sequence of the tuple ``(command, data)``.
+        """
+        if self._stopped:
+            log.warning(
+                'Dropping %d commands queued after the worker was stopped',
+                len(commands))
+            return
+
+        await self._slots.acquire()
+        self._queue.put_nowait((dispatch, commands, asyncio.get_event_loop()))
+
+    def stop(self):
+        """Stops the worker thread once all queued commands are dispatched.
+        """
+        self._stopped = True
+        self._queue.put(None)
+        self._thread.join()
+
+    def _run(self):
+        while True:
+            items = [self._queue.get()]
+            try:
+                while True:
+                    items.append(self._queue.get_nowait())
+            except queue.Empty:
+                pass
+
+            for dispatch, group in itertools.groupby(
+                    items,
+                    lambda item: item[0] if item is not None else None):
+                if dispatch is None:
+                    return
+
+                group = list(group)
+                commands = (
+                    command
+                    for _, commands, _ in group
+                    for command in commands)
+                if self._coalesce:
+                    commands = dispatch.coalesce(commands)
+                for command, data in commands:
+                    try:
+                        dispatch(command, data)
+                    except Exception as e:
+                        log.exception(
+                            'Failed to dispatch %s: %s', command, str(e))
+
+                # Make room for the batches on the event loops that queued
+                # them
+                for _, _, loop in group:
+                    try:
+                        loop.call_soon_threadsafe(self._slots.release)
+                    except RuntimeError:
+                        # The event loop is closed
+                        pass
@@ -15,33 +15,146 @@
 # You should have received a copy of the GNU General Public License along with
 # this program. If not, see <http://www.gnu.org/licenses/>.
 
+import functools
+import json
+import logging
+import os
+import threading
+import unicodedata
+
 from pynput.keyboard import KeyCode, Key, Controller
 
+from .. import resource
+from . import command
+
+
+#: The root path for layouts
+LAYOUT_ROOT = 'keyboard/layout'
+
+#: The extension of layout source files
+LAYOUT_EXTENSION = '.layout'
+
+#: The maximum number of resolved key codes to keep
+KEYCODE_CACHE_SIZE = 1024
+
+#: The controller shared by all handlers
+_controller = None
+
+#: The lock used to create the shared controller
+_controller_lock = threading.Lock()
+
+
+def controller():
+    """Returns the keyboard controller shared by all handlers.
+
+    The controller is created on first use.
+
+    :return: a controller
+    :rtype: pynput.keyboard.Controller
+    """
+    global _controller
+    with _controller_lock:
+        if _controller is None:
+            _controller = Controller()
+        return _controller
+
+
+def close():
+    """Drops the keyboard controller shared by all handlers.
+
+    This must only be called when no more commands are dispatched. The
+    controller releases its display connection when it is garbage collected,
+    and a new one is created by the next call to :func:`controller`. Any
+    pending dead key is discarded along with it.
+    """
+    global _controller
+    with _controller_lock:
+        _controller = None
+
+
+@functools.lru_cache(maxsize=KEYCODE_CACHE_SIZE)
+def keycode(name, is_dead):
+    """Resolves a key description to a value that can be passed to
+    :meth:`pynput.keyboard.Controller.press` and
+    :meth:`~pynput.keyboard.Controller.release`.
+
+    Resolved values are cached.
+
+    :param str name: The name of the key. This should typically be the actual
+        character requested. If it starts with ``'<'`` and ends with ``'>'``,
+        the key value is looked up in :class:`pynput.keyboard.Key`, otherwise
+        it is passed straight to :meth:`pynput.keyboard.Controller.press`.
+
+    :param bool is_dead: Whether the key is a dead key.
+
+    :return: a key value
+    """
+    if is_dead:
+        return KeyCode.from_dead(name)
+    elif name[0] == '<' and name[-1] == '>':
+        return Key[name[1:-1]]
+    else:
+        return name
+
+
+def prewarm(layout_file=None):
+    """Resolves all keys of a keyboard layout to populate the cache used by
+    :func:`keycode`.
+
+    Failures are logged and otherwise ignored.
+
+    :param str layout_file: The file name of the layout in
+        :attr:`LAYOUT_ROOT`. If this is not specified, the first layout is
+        used.
+    """
+    log = logging.getLogger(__name__)
+    try:
+        if layout_file is None:
+            layout_files = sorted(
+                name
+                for name in resource.list(LAYOUT_ROOT)
+                if name.endswith(LAYOUT_EXTENSION))
+            if not layout_files:
+                return
+            layout_file = layout_files[0]
+        with resource.open_stream(
+                os.path.join(LAYOUT_ROOT, layout_file)) as f:
+            layout = json.loads(f.read().decode('utf-8'))
+    except Exception as e:
+        log.warning('Failed to load keyboard layout: %s', str(e))
+        return
+
+    for levels in layout['layout'].values():
+        for name, is_dead in levels:
+            try:
+                keycode(name, is_dead)
+            except Exception:
+                log.debug('Failed to resolve %s', name)
+
 
 class Handler(object):
+    """A handler for keyboard events.
+
+    The controller is shared between all handlers, but every handler keeps
+    track of its own pressed keys.
+    """
     def __init__(self):
-        self.d = Controller()
+        self.d = controller()
+        self.pressed = set()
+        self.dead = False
 
     def keycode(self, name, is_dead):
         """Resolves a key description to a value that can be passed to
         :meth:`pynput.keyboard.Controller.press` and
         :meth:`~pynput.keyboard.Controller.release`.
 
-        :param str name: The name of the key. This should typically be the
-            actual character requested. If it starts with ``'<'`` and ends with
-            ``'>'``, the key value is looked up in
-            :class:`pynput.keyboard.Key`, otherwise it is passed straight to
-            :meth:`pynput.keyboard.Controller.press`.
+        See :func:`keycode` for a description of the parameters.
 
         :return: a key value
         """
-        if is_dead:
-            return KeyCode.from_dead(name)
-        elif name[0] == '<' and name[-1] == '>':
-            return Key[name[1:-1]]
-        else:
-            return name
+        return keycode(name, is_dead)
 
+    @command
     def down(self, name, is_dead=False):
         """Triggers a key down event.
 
@@ -54,7 +167,10 @@ class Handler(object):
             character typed.
         """
         self.d.press(self.keycode(name, is_dead))
+        self.pressed.add((name, is_dead))
+        self.dead = is_dead
 
+    @command
     def up(self, name, is_dead=False):
         """Triggers a key up event.
 
@@ -67,3 +183,35 @@ class Handler(object):
             character typed.
         """
         self.d.release(self.keycode(name, is_dead))
+        self.pressed.discard((name, is_dead))
+
+    @command(internal=True)
+    def release_all(self):
+        """Releases all keys pressed by this handler.
+
+        If the last key pressed by this handler was a dead key, the dead key
+        pending in the shared controller is discarded, so that it is not
+        combined with the next character typed by another client.
+        """
+        for name, is_dead in list(self.pressed):
+            self.up(name, is_dead)
+
+        if self.dead:
+            # pynput provides no public API to discard a pending dead key
+            if getattr(self.d, '_dead_key', None) is not None:
+                self.d._dead_key = None
+            self.dead = False
+
+    @command
+    def type(self, text):
+        """Types a string.
+
+        The string is normalised to its composed form before it is typed, so
+        that characters followed by combining marks are typed as single
+        characters where possible. If a dead key is pending, it is combined
+        with the first character typed.
+
+        :param str text: The string to type.
+        """
+        self.d.type(unicodedata.normalize('NFC', text))
+        self.dead = False
@@ -15,20 +15,67 @@
 # You should have received a copy of the GNU General Public License along with
 # this program. If not, see <http://www.gnu.org/licenses/>.
 
+import threading
+
 from pynput.mouse import Button, Controller
 
+from . import command
+
+
+#: The controller shared by all handlers
+_controller = None
+
+#: The lock used to create the shared controller
+_controller_lock = threading.Lock()
+
+
+def controller():
+    """Returns the mouse controller shared by all handlers.
+
+    The controller is created on first use.
+
+    :return: a controller
+    :rtype: pynput.mouse.Controller
+    """
+    global _controller
+    with _controller_lock:
+        if _controller is None:
+            _controller = Controller()
+        return _controller
+
+
+def close():
+    """Drops the mouse controller shared by all handlers.
+
+    This must only be called when no more commands are dispatched. The
+    controller releases its display connection when it is garbage collected,
+    and a new one is created by the next call to :func:`controller`.
+    """
+    global _controller
+    with _controller_lock:
+        _controller = None
+
 
 class Handler(object):
     """A handler for mouse events.
+
+    The controller is shared between all handlers, but every handler keeps
+    track of its own scroll offset and pressed buttons.
     """
     #: The scroll threshold required to actually perform scrolling
     SCROLL_THRESHOLD = 10
 
+    #: The methods whose consecutive invocations may be merged by summing their
+    #: arguments
+    COALESCABLE = ('move', 'scroll')
+
     def __init__(self):
-        self.d = Controller()
+        self.d = controller()
         self.ax = 0
         self.ay = 0
+        self.pressed = set()
 
+    @command
     def down(self, button='left'):
         """Triggers a a mouse press event.
 
@@ -36,7 +83,9 @@ class Handler(object):
             defined for :class:`pynput.mouse.Button`.
         """
         self.d.press(Button[button])
+        self.pressed.add(button)
 
+    @command
     def up(self, button='left'):
         """Triggers a a mouse release event.
 
@@ -44,7 +93,16 @@ class Handler(object):
             defined for :class:`pynput.mouse.Button`.
         """
         self.d.release(Button[button])
+        self.pressed.discard(button)
+
+    @command(internal=True)
+    def release_all(self):
+        """Releases all buttons pressed by this handler.
+        """
+        for button in list(self.pressed):
+            self.up(button)
 
+    @command
     def scroll(self, dx=0, dy=0):
         """Triggers a mouse scroll event.
 
@@ -68,6 +126,7 @@ class Handler(object):
                 xscroll,
                 yscroll)
 
+    @command
     def move(self, dx=0, dy=0):
         """Triggers a mouse move event.
 
@@ -37,8 +37,9 @@ exports.app = (function() {
     var ws, touchpad, keyboard;
     module.ws = {
         onOpen: function() {
-            touchpad = new controller.Touchpad(ws);
-            keyboard = new controller.Keyboard(ws);
+            var channel = new controller.Channel(ws);
+            touchpad = new controller.Touchpad(channel);
+            keyboard = new controller.Keyboard(channel);
 
             // We are now connected
             document.body.classList.add("connected");
@@ -181,7 +182,8 @@ exports.app = (function() {
                     util.mapSupplier(document.location))
                 + (document.location.hash
                         ? "?access_token=" + document.location.hash.substring(1)
-                        : ""));
+                        : ""),
+            [controller.BINARY_PROTOCOL]);
         ws.onopen = app.ws.onOpen;
         ws.onclose = app.ws.onClose;
         ws.onerror = app.ws.onError;
@@ -19,13 +19,182 @@
  * Controllers for the touchpad and keyboard.
  */
 exports.controller = (function() {
-    var module = {};
+    var module = {
+        /**
+         * The WebSocket sub-protocol used to negotiate binary framing.
+         */
+        BINARY_PROTOCOL: "virtualtouchpad.binary"};
 
     /**
-     * The touchpad controller.
+     * The opcodes of the binary records, keyed on command.
+     */
+    var OPCODES = {
+        "mouse.move": 0x01,
+        "mouse.scroll": 0x02,
+        "mouse.down": 0x03,
+        "mouse.up": 0x04,
+        "key.down": 0x05,
+        "key.up": 0x06,
+        "key.type": 0x07};
+
+    /**
+     * The mouse buttons, in the order of their indices on the wire.
      */
-    function Touchpad(ws) {
+    var BUTTONS = ["left", "middle", "right"];
+
+    /**
+     * Encodes a command as a binary record.
+     *
+     * See virtualtouchpad.protocol for a description of the format.
+     *
+     * @param command
+     *     The command name.
+     * @param data
+     *     The command arguments.
+     * @return an ArrayBuffer, or undefined if the command cannot be encoded
+     */
+    function encode(command, data) {
+        var buffer, view, text;
+        switch (command) {
+        case "mouse.move":
+        case "mouse.scroll":
+            buffer = new ArrayBuffer(9);
+            view = new DataView(buffer);
+            view.setUint8(0, OPCODES[command]);
+            view.setFloat32(1, data.dx, true);
+            view.setFloat32(5, data.dy, true);
+            return buffer;
+
+        case "mouse.down":
+        case "mouse.up":
+            if (BUTTONS.indexOf(data.button) < 0) {
+                return undefined;
+            }
+            buffer = new ArrayBuffer(2);
+            view = new DataView(buffer);
+            view.setUint8(0, OPCODES[command]);
+            view.setUint8(1, BUTTONS.indexOf(data.button));
+            return buffer;
+
+        case "key.down":
+        case "key.up":
+            if (!window.TextEncoder) {
+                return undefined;
+            }
+            text = new TextEncoder().encode(data.name);
+            if (text.length > 255) {
+                return undefined;
+            }
+            buffer = new ArrayBuffer(3 + text.length);
+            view = new DataView(buffer);
+            view.setUint8(0, OPCODES[command]);
+            view.setUint8(1, data.is_dead ? 1 : 0);
+            view.setUint8(2, text.length);
+            new Uint8Array(buffer, 3).set(text);
+            return buffer;
+
+        case "key.type":
+            if (!window.TextEncoder) {
+                return undefined;
+            }
+            text = new TextEncoder().encode(data.text);
+            if (text.length > 65535) {
+                return undefined;
+            }
+            buffer = new ArrayBuffer(3 + text.length);
+            view = new DataView(buffer);
+            view.setUint8(0, OPCODES[command]);
+            view.setUint16(1, text.length, true);
+            new Uint8Array(buffer, 3).set(text);
+            return buffer;
+
+        default:
+            return undefined;
+        }
+    }
+
+    /**
+     * A channel used to send commands over a WebSocket.
+     *
+     * Commands sent during one animation frame are coalesced and sent as one
+     * WebSocket frame when the next frame is rendered.
+     *
+     * @param ws
+     *     The WebSocket.
+     */
+    function Channel(ws) {
         this.ws = ws;
+        this.queue = [];
+    };
+    module.Channel = Channel;
+
+    /**
+     * Queues a command.
+     *
+     * If the binary sub-protocol has been negotiated, the command is sent as
+     * a binary record, otherwise it is sent as JSON.
+     *
+     * @param command
+     *     The command name.
+     * @param data
+     *     The command arguments.
+     */
+    Channel.prototype.send = function(command, data) {
+        var buffer = this.ws.protocol == module.BINARY_PROTOCOL
+            ? encode(command, data)
+            : undefined;
+        this.queue.push(buffer || {
+            command: command,
+            data: data});
+
+        if (this.queue.length == 1) {
+            requestAnimationFrame(this.flush.bind(this));
+        }
+    };
+
+    /**
+     * Sends all queued commands.
+     *
+     * Consecutive binary records are joined into one frame, and consecutive
+     * JSON commands are sent as one array.
+     */
+    Channel.prototype.flush = function() {
+        var queue = this.queue;
+        this.queue = [];
+
+        var i = 0;
+        while (i < queue.length) {
+            var j = i;
+            if (queue[i] instanceof ArrayBuffer) {
+                var length = 0;
+                while (j < queue.length && queue[j] instanceof ArrayBuffer) {
+                    length += queue[j++].byteLength;
+                }
+                var frame = new Uint8Array(length), offset = 0;
+                for (; i < j; i++) {
+                    frame.set(new Uint8Array(queue[i]), offset);
+                    offset += queue[i].byteLength;
+                }
+                this.ws.send(frame.buffer);
+            }
+            else {
+                while (j < queue.length
+                        && !(queue[j] instanceof ArrayBuffer)) {
+                    j++;
+                }
+                this.ws.send(JSON.stringify(j - i == 1
+                    ? queue[i]
+                    : queue.slice(i, j)));
+                i = j;
+            }
+        }
+    };
+
+    /**
+     * The touchpad controller.
+     */
+    function Touchpad(channel) {
+        this.channel = channel;
     };
     module.Touchpad = Touchpad;
 
@@ -36,10 +205,8 @@ exports.controller = (function() {
      *     The button name.
      */
     Touchpad.prototype.buttonDown = function(button) {
-        this.ws.send(JSON.stringify({
-            command: "mouse.down",
-            data: {
-                button: button}}));
+        this.channel.send("mouse.down", {
+            button: button});
     };
 
     /**
@@ -49,10 +216,8 @@ exports.controller = (function() {
      *     The button name.
      */
     Touchpad.prototype.buttonUp = function(button) {
-        this.ws.send(JSON.stringify({
-            command: "mouse.up",
-            data: {
-                button: button}}));
+        this.channel.send("mouse.up", {
+            button: button});
     };
 
     /**
@@ -62,11 +227,9 @@ exports.controller = (function() {
      *     The horizontal and vertical scroll.
      */
     Touchpad.prototype.scroll = function(dx, dy) {
-        this.ws.send(JSON.stringify({
-            command: "mouse.scroll",
-            data: {
-                dx: dx,
-                dy: dy}}));
+        this.channel.send("mouse.scroll", {
+            dx: dx,
+            dy: dy});
     };
 
     /**
@@ -76,18 +239,16 @@ exports.controller = (function() {
      *     The horizontal and vertical movement.
      */
     Touchpad.prototype.move = function(dx, dy) {
-        this.ws.send(JSON.stringify({
-            command: "mouse.move",
-            data: {
-                dx: dx,
-                dy: dy}}));
+        this.channel.send("mouse.move", {
+            dx: dx,
+            dy: dy});
     };
 
     /**
      * The keyboard controller.
      */
-    function Keyboard(ws) {
-        this.ws = ws;
+    function Keyboard(channel) {
+        this.channel = channel;
     };
     module.Keyboard = Keyboard;
 
@@ -101,11 +262,9 @@ exports.controller = (function() {
      *     Whether this is a dead key press.
      */
     Keyboard.prototype.press = function(name, isDead) {
-        this.ws.send(JSON.stringify({
-            command: "key.down",
-            data: {
-                name: name,
-                is_dead: isDead}}));
+        this.channel.send("key.down", {
+            name: name,
+            is_dead: isDead});
     };
 
     /**
@@ -118,11 +277,20 @@ exports.controller = (function() {
      *     Whether this is a dead key press.
      */
     Keyboard.prototype.release = function(name, isDead) {
-        this.ws.send(JSON.stringify({
-            command: "key.up",
-            data: {
-                name: name,
-                is_dead: isDead}}));
+        this.channel.send("key.up", {
+            name: name,
+            is_dead: isDead});
+    };
+
+    /**
+     * Types a string.
+     *
+     * @param text
+     *     The string to type.
+     */
+    Keyboard.prototype.type = function(text) {
+        this.channel.send("key.type", {
+            text: text});
     };
 
     return module;
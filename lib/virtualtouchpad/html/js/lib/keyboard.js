@@ -134,7 +134,47 @@ exports.keyboard = (function() {
             ALTGR: "mod-altgr"
         },
 
-        READY_CLASS: "ready"
+        READY_CLASS: "ready",
+
+        /**
+         * Expands a layout in the compact form generated at build time.
+         *
+         * In the compact form, every distinct key name is stored once in
+         * `strings`, and every key in `layout` is an array of integers. An
+         * integer is the index of the key name shifted left by one, with the
+         * lowest bit set for dead keys.
+         *
+         * @param layout
+         *     The layout data. If this is not in the compact form, it is
+         *     returned unchanged.
+         * @return the layout data as described in the layout README
+         */
+        expand: function(layout) {
+            var strings = layout.strings;
+            if (!strings) {
+                return layout;
+            }
+
+            var keys = {};
+            for (var id in layout.layout) {
+                if (!layout.layout.hasOwnProperty(id)) {
+                    continue;
+                }
+
+                var indices = layout.layout[id];
+                var levels = new Array(indices.length);
+                for (var i = 0; i < indices.length; i++) {
+                    levels[i] = [
+                        strings[indices[i] >> 1],
+                        (indices[i] & 1) !== 0];
+                }
+                keys[id] = levels;
+            }
+
+            return {
+                meta: layout.meta,
+                layout: keys};
+        }
     };
 
     /**
@@ -183,7 +223,9 @@ exports.keyboard = (function() {
                 ajax.onload = (function(e) {
                     try {
                         // Apply the layout and mark the keyboard as ready
-                        if (this._applyLayout(JSON.parse(ajax.responseText))) {
+                        var layout = module.expand(
+                            JSON.parse(ajax.responseText));
+                        if (this._applyLayout(layout)) {
                             parentEl.classList.add(module.READY_CLASS);
                         }
                         else {
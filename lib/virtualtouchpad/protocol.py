@@ -0,0 +1,139 @@
+# coding=utf-8
+# virtual-touchpad
+# Copyright (C) 2013-2017 Moses Palmér
+#
+# This program is free software: you can redistribute it and/or modify it under
+# the terms of the GNU General Public License as published by the Free Software
+# Foundation, either version 3 of the License, or (at your option) any later
+# version.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program. If not, see <http://www.gnu.org/licenses/>.
+
+import struct
+
+
+#: The *WebSocket* sub-protocol used to negotiate binary framing
+BINARY = 'virtualtouchpad.binary'
+
+#: The mouse buttons, in the order of their indices on the wire
+BUTTONS = (
+    'left',
+    'middle',
+    'right')
+
+
+class Record(object):
+    def __init__(self, opcode, command, fmt, names, text=None):
+        """A record type.
+
+        :param int opcode: The opcode identifying this record type.
+
+        :param str command: The dispatcher command.
+
+        :param str fmt: The :mod:`struct` format of the fixed payload, not
+            including the opcode.
+
+        :param names: The argument names of the values in the fixed payload.
+
+        :param str text: The argument name of the trailing text, if any. If
+            this is set, the last value of the fixed payload is the length of
+            the text, and it is not included in ``names``.
+        """
+        self.opcode = opcode
+        self.command = command
+        self.struct = struct.Struct('<' + fmt)
+        self.names = names
+        self.text = text
+
+
+#: The known record types
+RECORDS = (
+    Record(0x01, 'mouse.move', 'ff', ('dx', 'dy')),
+    Record(0x02, 'mouse.scroll', 'ff', ('dx', 'dy')),
+    Record(0x03, 'mouse.down', 'B', ('button',)),
+    Record(0x04, 'mouse.up', 'B', ('button',)),
+    Record(0x05, 'key.down', '?B', ('is_dead',), 'name'),
+    Record(0x06, 'key.up', '?B', ('is_dead',), 'name'),
+    Record(0x07, 'key.type', 'H', (), 'text'))
+
+_BY_OPCODE = {record.opcode: record for record in RECORDS}
+_BY_COMMAND = {record.command: record for record in RECORDS}
+
+
+def decode(frame):
+    """Decodes a binary frame.
+
+    A binary frame is a sequence of records. Every record starts with an opcode
+    byte, followed by a fixed size, little endian payload. Records for key
+    events additionally carry a variable length *UTF-8* encoded key name, whose
+    length is the last value of the fixed payload.
+
+    :param bytes frame: The frame received.
+
+    :return: a generator yielding the tuple ``(command, data)`` for every
+        record in the frame
+
+    :raises ValueError: if the frame contains an unknown opcode or is truncated
+    """
+    view = memoryview(frame)
+    offset = 0
+    while offset < len(view):
+        try:
+            record = _BY_OPCODE[view[offset]]
+        except KeyError:
+            raise ValueError('unknown opcode 0x%02X' % view[offset])
+        offset += 1
+
+        try:
+            values = record.struct.unpack_from(view, offset)
+        except struct.error:
+            raise ValueError('truncated %s record' % record.command)
+        offset += record.struct.size
+
+        if record.text:
+            length = values[-1]
+            values = values[:-1]
+            if offset + length > len(view):
+                raise ValueError('truncated %s record' % record.command)
+            text = bytes(view[offset:offset + length]).decode('utf-8')
+            offset += length
+        data = dict(zip(record.names, values))
+        if record.text:
+            data[record.text] = text
+        if 'button' in data:
+            try:
+                data['button'] = BUTTONS[data['button']]
+            except IndexError:
+                raise ValueError('unknown button %d' % data['button'])
+
+        yield record.command, data
+
+
+def encode(command, data):
+    """Encodes a single command as a binary record.
+
+    :param str command: The dispatcher command.
+
+    :param dict data: The arguments.
+
+    :return: the encoded record
+    :rtype: bytes
+
+    :raises KeyError: if ``command`` has no binary representation
+    """
+    record = _BY_COMMAND[command]
+    values = [
+        BUTTONS.index(data[name]) if name == 'button' else data[name]
+        for name in record.names]
+    if record.text:
+        text = data[record.text].encode('utf-8')
+        return bytes((record.opcode,)) + record.struct.pack(
+            *values, len(text)) + text
+    else:
+        return bytes((record.opcode,)) + record.struct.pack(*values)
@@ -15,8 +15,12 @@
 # You should have received a copy of the GNU General Public License along with
 # this program. If not, see <http://www.gnu.org/licenses/>.
 
-import pkg_resources
+import io
+import json
+import mmap
 import os
+import posixpath
+import struct
 import sys
 
 import virtualtouchpad
@@ -28,12 +32,90 @@ PKG_RESOURCES_PACKAGE = virtualtouchpad.__name__
 #: The name of the environment variable specifying a resource path override
 STATIC_ROOT_ENV = 'VIRTUAL_TOUCHPAD_STATIC_ROOT'
 
+#: The name of the environment variable specifying a resource bundle
+BUNDLE_ENV = 'VIRTUAL_TOUCHPAD_BUNDLE'
+
 #: The base directory for all files
 RESOURCE_BASE = virtualtouchpad.__name__
 
 #: The path, relative to some root directory, of the resources
 RESOURCE_PATH = RESOURCE_BASE
 
+#: The file name, relative to some root directory, of the resource bundle
+BUNDLE_PATH = RESOURCE_BASE + '.bundle'
+
+#: The magic bytes starting a resource bundle
+BUNDLE_MAGIC = b'VTPBNDL1'
+
+#: The header following the magic bytes; this is the length of the index
+BUNDLE_HEADER = struct.Struct('<I')
+
+
+class Bundle(object):
+    def __init__(self, path):
+        """A resource bundle.
+
+        A bundle is a single uncompressed archive of resources, which is mapped
+        into memory. It starts with :attr:`BUNDLE_MAGIC` and
+        :attr:`BUNDLE_HEADER`, followed by a *JSON* index mapping resource
+        paths to the list ``[offset, size, mtime]``, and finally the file data.
+        Offsets are relative to the end of the index.
+
+        :param str path: The file system path of the bundle.
+
+        :raises ValueError: if the file is not a bundle
+        """
+        with open(path, 'rb') as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        view = memoryview(self._mmap)
+
+        start = len(BUNDLE_MAGIC) + BUNDLE_HEADER.size
+        if len(view) < start or view[:len(BUNDLE_MAGIC)] != BUNDLE_MAGIC:
+            raise ValueError('%s is not a resource bundle' % path)
+        length, = BUNDLE_HEADER.unpack_from(view, len(BUNDLE_MAGIC))
+
+        #: The index of the bundle
+        self.index = json.loads(
+            bytes(view[start:start + length]).decode('utf-8'))
+        self._data = view[start + length:]
+
+    def read(self, key):
+        """Reads a file from the bundle without copying it.
+
+        :param str key: The normalised resource path.
+
+        :return: the file content
+        :rtype: memoryview
+
+        :raises KeyError: if the file does not exist
+        """
+        offset, size, mtime = self.index[key]
+        return self._data[offset:offset + size]
+
+
+def __get_bundle():
+    # A resource path override takes precedence
+    if os.path.isdir(os.environ.get(STATIC_ROOT_ENV, '')):
+        return None
+
+    candidates = [os.environ.get(BUNDLE_ENV)]
+
+    # Frozen applications may put the bundle alongside the executable, or in
+    # the directory to which they extract data
+    if getattr(sys, 'frozen', False):
+        candidates.extend(
+            os.path.join(directory, BUNDLE_PATH)
+            for directory in (
+                getattr(sys, '_MEIPASS', None),
+                os.path.dirname(sys.executable))
+            if directory)
+
+    for candidate in candidates:
+        if candidate and os.path.isfile(candidate):
+            return Bundle(candidate)
+
+    return None
+
 
 def __get_static_root():
     def correct(path):
@@ -78,32 +160,149 @@ def __get_static_root():
     return None
 
 
-STATIC_ROOT = __get_static_root()
+#: The resource bundle, if resources are read from one
+BUNDLE = __get_bundle()
+
+STATIC_ROOT = __get_static_root() if BUNDLE is None else None
 
 
-def _abs(path):
-    """Translates a path to an absolute path.
+class Entry(object):
+    def __init__(self, size, mtime, children):
+        """An entry in the resource manifest.
+
+        :param int size: The size of the file, or ``None`` if unknown.
+
+        :param float mtime: The modification time of the file, or ``None`` if
+            unknown.
+
+        :param children: The names of the resources in this directory, or
+            ``None`` if this entry is not a directory.
+        """
+        self.size = size
+        self.mtime = mtime
+        self.children = children
+
+
+def _key(path):
+    """Translates a resource path to a manifest key.
 
     :param str path: The relative path.
 
-    :return: an absolute path
+    :return: a normalised path; the root is represented by ``''``
+    """
+    key = posixpath.normpath(path.replace(os.path.sep, '/'))
+    return '' if key == '.' else key
+
+
+def _build_from_directory(root):
+    """Builds a resource manifest from a directory.
+
+    Files whose real paths lie outside of ``root`` are excluded.
+
+    :param str root: The root directory. This must end with a path separator.
+
+    :return: a manifest
+    """
+    manifest = {}
+    for dirpath, dirnames, filenames in os.walk(root):
+        key = _key(os.path.relpath(dirpath, root))
+        children = []
+        for name in dirnames + filenames:
+            path = os.path.join(dirpath, name)
+            if not os.path.realpath(path).startswith(root):
+                continue
+            children.append(name)
+            if name in filenames:
+                st = os.stat(path)
+                manifest[posixpath.join(key, name)] = Entry(
+                    st.st_size, st.st_mtime, None)
+        manifest[key] = Entry(None, os.path.getmtime(dirpath), children)
+
+    return manifest
+
 
-    :raises FileNotFoundError: if the resulting path lies outside of the root; a
-        successful return does not indicate that the file actually exists
+def _build_from_bundle(bundle):
+    """Builds a resource manifest from a bundle.
 
-    :raises ValueError: if no static root is set
+    Directories are not stored in bundles, but derived from the paths of the
+    files.
+
+    :param Bundle bundle: The bundle.
+
+    :return: a manifest
     """
-    if STATIC_ROOT is None:
-        raise ValueError(STATIC_ROOT)
+    manifest = {'': Entry(None, None, [])}
+    for key, (offset, size, mtime) in sorted(bundle.index.items()):
+        manifest[key] = Entry(size, mtime, None)
+        parent, name = posixpath.split(key)
+        while True:
+            is_new = parent not in manifest
+            manifest.setdefault(parent, Entry(None, None, [])).children.append(
+                name)
+            if not parent or not is_new:
+                break
+            parent, name = posixpath.split(parent)
+
+    return manifest
+
+
+def _build_from_package():
+    """Builds a resource manifest using :mod:`pkg_resources`.
+
+    :return: a manifest
+    """
+    import pkg_resources
+
+    manifest = {}
 
-    if not path:
-        return os.path.dirname(STATIC_ROOT)
+    def add(key):
+        if pkg_resources.resource_isdir(PKG_RESOURCES_PACKAGE, key):
+            children = pkg_resources.resource_listdir(
+                PKG_RESOURCES_PACKAGE, key)
+            manifest[key] = Entry(None, None, children)
+            for name in children:
+                add(posixpath.join(key, name))
+        else:
+            manifest[key] = Entry(None, None, None)
 
-    apath = os.path.realpath(os.path.join(STATIC_ROOT, path))
-    if apath.startswith(STATIC_ROOT):
-        return apath
+    add('')
+    return manifest
+
+
+def refresh():
+    """Rebuilds the resource manifest.
+
+    This must be called for changes to the resources to be picked up.
+    """
+    global _manifest
+    if BUNDLE is not None:
+        _manifest = _build_from_bundle(BUNDLE)
+    elif STATIC_ROOT is None:
+        _manifest = _build_from_package()
     else:
+        _manifest = _build_from_directory(STATIC_ROOT)
+
+
+#: The resource manifest, mapping normalised resource paths to entries
+_manifest = {}
+refresh()
+
+
+def _file_key(path):
+    """Translates the path of a file to a manifest key.
+
+    :param str path: The path of the static file.
+
+    :return: a manifest key
+
+    :raises FileNotFoundError: if the file does not exist
+    """
+    key = _key(path)
+    entry = _manifest.get(key)
+    if entry is None or entry.children is not None:
         raise FileNotFoundError(path)
+    else:
+        return key
 
 
 def exists(path):
@@ -111,16 +310,7 @@ def exists(path):
 
     :param str path: The path of the static file.
     """
-    try:
-        return os.access(_abs(path), os.R_OK)
-
-    except ValueError:
-        return pkg_resources.resource_exists(
-            PKG_RESOURCES_PACKAGE,
-            path)
-
-    except:
-        return False
+    return _key(path) in _manifest
 
 
 def isdir(path):
@@ -128,16 +318,34 @@ def isdir(path):
 
     :param str path: The path of the static file.
     """
-    try:
-        return os.path.isdir(_abs(path))
+    entry = _manifest.get(_key(path))
+    return entry is not None and entry.children is not None
 
-    except ValueError:
-        return pkg_resources.resource_isdir(
-            PKG_RESOURCES_PACKAGE,
-            path)
 
-    except:
-        return False
+def filename(path):
+    """Returns the file system path of a static file.
+
+    :param str path: The path of the static file.
+
+    :return: a file system path, or ``None`` if static files are not stored
+        on the file system or the file does not exist
+    """
+    key = _key(path)
+    if STATIC_ROOT is None or key not in _manifest:
+        return None
+    else:
+        return os.path.join(STATIC_ROOT, key)
+
+
+def getmtime(path):
+    """Returns the modification time of a static file.
+
+    :param str path: The path of the static file.
+
+    :return: the modification time, or ``None`` if it cannot be determined
+    """
+    entry = _manifest.get(_key(path))
+    return entry.mtime if entry is not None else None
 
 
 def list(path):
@@ -148,16 +356,30 @@ def list(path):
     :return: a list of resources
     :rtype: [str]
     """
-    try:
-        return os.listdir(_abs(path))
+    entry = _manifest.get(_key(path))
+    if entry is None or entry.children is None:
+        return []
+    else:
+        return [name for name in entry.children]
 
-    except ValueError:
-        return pkg_resources.resource_listdir(
-            PKG_RESOURCES_PACKAGE,
-            path)
 
-    except:
-        return []
+def read(path):
+    """Reads a file.
+
+    If resources are read from a bundle, the content is not copied.
+
+    :param str path: The path of the static file.
+
+    :return: the file content
+    :rtype: bytes or memoryview
+
+    :raises FileNotFoundError: if the file does not exist
+    """
+    if BUNDLE is not None:
+        return BUNDLE.read(_file_key(path))
+    else:
+        with open_stream(path) as f:
+            return f.read()
 
 
 def open_stream(path):
@@ -166,14 +388,18 @@ def open_stream(path):
     :param str path: The path of the static file.
 
     :return: a file-like object
+
+    :raises FileNotFoundError: if the file does not exist
     """
+    key = _file_key(path)
     try:
-        return open(_abs(path), 'rb')
-
-    except ValueError:
-        return pkg_resources.resource_stream(
-            PKG_RESOURCES_PACKAGE,
-            path)
+        if BUNDLE is not None:
+            return io.BytesIO(BUNDLE.read(key))
+        elif STATIC_ROOT is None:
+            import pkg_resources
+            return pkg_resources.resource_stream(PKG_RESOURCES_PACKAGE, key)
+        else:
+            return open(os.path.join(STATIC_ROOT, key), 'rb')
 
     except:
         raise FileNotFoundError(path)
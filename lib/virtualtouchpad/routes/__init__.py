@@ -16,6 +16,7 @@
 # this program. If not, see <http://www.gnu.org/licenses/>.
 
 import aiohttp
+import asyncio
 import functools
 import json
 import logging
@@ -49,6 +50,8 @@ def get(path):
                         status=204)
                 elif isinstance(response, dict):
                     return aiohttp.web.json_response(response)
+                elif isinstance(response, aiohttp.web.FileResponse):
+                    return response
                 else:
                     return aiohttp.web.Response(
                         body=response.body,
@@ -73,7 +76,7 @@ def get(path):
     return inner
 
 
-def report_error(ws, reason, exception=None, tb=None):
+async def report_error(ws, reason, exception=None, tb=None):
     """Sends an error report over a *WebSocket* in a format that is parsable by
     the client.
 
@@ -85,7 +88,7 @@ def report_error(ws, reason, exception=None, tb=None):
 
     :param tb: The traceback.
     """
-    ws.send_str(json.dumps(dict(
+    await ws.send_str(json.dumps(dict(
         reason=reason,
         exception=type(exception).__name__ if exception else None,
         data=str(exception) if exception else None,
@@ -95,7 +98,7 @@ def report_error(ws, reason, exception=None, tb=None):
             traceback.extract_tb(tb)] if tb else None)))
 
 
-def websocket(path, access_control=lambda app, request: None):
+def websocket(path, access_control=lambda app, request: None, protocols=()):
     """A decorator to mark a function as handling incoming *WebSocket* commands.
 
     This is not a generic *WebSocket* handler; it will only handle incoming
@@ -110,6 +113,12 @@ def websocket(path, access_control=lambda app, request: None):
         be called before the request is upgraded, and is passed the parameters
         ``(app, request)``, where ``app`` is the current application, and
         ``request`` is the request to upgrade to a *WebSocket*.
+
+    :param protocols: The *WebSocket* sub-protocols supported by the handler.
+        The one selected is available as ``ws.protocol``.
+
+    Open *WebSockets* are closed when the application shuts down, which ends
+    the iteration over received messages in the handler.
     """
     log = logging.getLogger('%s.%s' % (__name__, path))
 
@@ -117,15 +126,18 @@ def websocket(path, access_control=lambda app, request: None):
         async def wrapper(request):
             access_control(app, request)
 
-            ws = aiohttp.web.WebSocketResponse()
+            ws = aiohttp.web.WebSocketResponse(protocols=protocols)
             await ws.prepare(request)
 
+            app['websockets'].add(ws)
             try:
                 await handler(app, request, ws)
             except Exception as e:
                 log.exception(
                     'An error occurred in WebSocket handler %s',
                     handler.__name__)
+            finally:
+                app['websockets'].discard(ws)
 
             return ws
 
@@ -139,17 +151,37 @@ def websocket(path, access_control=lambda app, request: None):
     return inner
 
 
+async def close_websockets(app):
+    """Closes all open *WebSockets*.
+
+    :param app: The application.
+    """
+    await asyncio.gather(*(
+        ws.close(code=aiohttp.WSCloseCode.GOING_AWAY)
+        for ws in list(app['websockets'])))
+
+
+#: The open *WebSockets*
+app['websockets'] = set()
+app.on_shutdown.append(close_websockets)
+
+
 def is_local_request(request):
     """Determines whether a request originates from the local host.
 
+    Only requests from ``SERVER_HOST`` are local. Requests from other
+    addresses, including loopback addresses used by a local reverse proxy
+    listening on ``SERVER_LISTEN``, are not.
+
     :param request: The request.
 
     :return: whether the request originates from the local host
     """
+    # Peers connected over Unix sockets have no address; they are likely
+    # proxies for remote clients
     peername = request.transport.get_extra_info('peername')
-    if peername is not None:
-        host, _ = peername
-        return host == app['server'].configuration.SERVER_HOST
+    if isinstance(peername, tuple):
+        return peername[0] == app['server'].configuration.SERVER_HOST
     else:
         return False
 
@@ -17,16 +17,18 @@
 
 import email.utils
 import functools
+import hashlib
 import logging
 import mimetypes
 import os
 import random
 import sys
-import time
 
-from aiohttp.web import HTTPFound, HTTPNotFound, Response
+from aiohttp.web import (
+    FileResponse, HTTPFound, HTTPNotFound, Response, StreamResponse)
 
 import virtualtouchpad.resource as resource
+from virtualtouchpad._fingerprint import FINGERPRINT_LENGTH
 
 
 #: The root directory, relative to the path in virtualtouchpad.resource, of the
@@ -40,6 +42,145 @@ IGNORE_CACHED = os.getenv(
     'no') == 'yes'
 
 
+class Asset(object):
+    def __init__(self, headers, body, mtime, variants=None, path=None):
+        """A static file read into memory, with precomputed response headers.
+
+        :param dict headers: The content headers, as returned by :func:`read`.
+
+        :param body: The file content. This may be a view into a resource
+            bundle. If ``path`` is set, this is ignored.
+
+        :param float mtime: The modification time of the file.
+
+        :param dict variants: Precompressed variants of this asset, keyed on
+            content encoding.
+
+        :param str path: The file system path of the file. If this is set, the
+            content is not kept in memory, but sent from the file for every
+            request.
+        """
+        self.body = body if path is None else None
+        self.path = path
+        self.mtime = int(mtime)
+        digest = hashlib.sha1(body).hexdigest() if path is None \
+            else file_digest(path)
+        self.etag = '"%s"' % digest
+        self.fingerprint = digest[:FINGERPRINT_LENGTH]
+        self.variants = variants or {}
+        self.headers = dict(headers)
+        if path is None:
+            self.headers['Content-Length'] = str(len(body))
+        self.headers['Last-Modified'] = email.utils.formatdate(
+            self.mtime, usegmt=True)
+        self.headers['ETag'] = self.etag
+
+        # The headers to send with HTTP 304
+        self.not_modified_headers = {
+            key: value
+            for key, value in self.headers.items()
+            if key in ('Cache-Control', 'ETag', 'Last-Modified', 'Vary')}
+
+    def is_modified(self, headers):
+        """Determines whether a conditional request must be answered with the
+        full content.
+
+        ``If-None-Match`` takes precedence over ``If-Modified-Since``.
+
+        :param headers: The request headers.
+
+        :return: whether the client copy is stale, or the request is not
+            conditional
+        """
+        if_none_match = headers.get('if-none-match')
+        if if_none_match is not None:
+            tags = entity_tags(if_none_match)
+            return not ('*' in tags or self.etag in tags)
+
+        if_modified_since = headers.get('if-modified-since')
+        if if_modified_since is not None:
+            timestamp = http_date(if_modified_since)
+            return timestamp is None or timestamp < self.mtime
+
+        return True
+
+
+class _FileResponse(FileResponse):
+    """A file response that keeps the validators of the asset.
+
+    :class:`aiohttp.web.FileResponse` replaces ``ETag`` and ``Last-Modified``
+    with values derived from the file system; since conditional requests are
+    handled by :func:`respond` before the file is sent, we keep the content
+    hash instead.
+    """
+    @property
+    def etag(self):
+        return StreamResponse.etag.fget(self)
+
+    @etag.setter
+    def etag(self, value):
+        pass
+
+    @property
+    def last_modified(self):
+        return StreamResponse.last_modified.fget(self)
+
+    @last_modified.setter
+    def last_modified(self, value):
+        pass
+
+
+#: The value of ``Cache-Control`` for fingerprinted files
+CACHE_CONTROL_IMMUTABLE = 'public, max-age=31536000, immutable'
+
+#: The minimum size of files sent directly from the file system instead of
+#: being kept in memory
+SENDFILE_SIZE = 64 * 1024
+
+#: The content encodings of precompressed files, and the extensions of such
+#: files, in order of preference
+PRECOMPRESSED = (
+    ('br', 'br'),
+    ('gzip', 'gz'))
+
+#: The maximum number of assets kept in memory; this is not used if
+#: :attr:`IGNORE_CACHED` is set
+ASSET_CACHE_SIZE = 128
+
+
+@functools.lru_cache(maxsize=32)
+def entity_tags(value):
+    """Parses a list of entity tags, such as the value of ``If-None-Match``.
+
+    Weak entity tags are converted to strong ones, since only weak comparison
+    is used.
+
+    :param str value: The header value.
+
+    :return: the entity tags
+    :rtype: frozenset
+    """
+    return frozenset(
+        tag[2:] if tag.startswith('W/') else tag
+        for tag in (tag.strip() for tag in value.split(','))
+        if tag)
+
+
+@functools.lru_cache(maxsize=32)
+def http_date(value):
+    """Parses an *HTTP* date, such as the value of ``If-Modified-Since``.
+
+    :param str value: The header value.
+
+    :return: a timestamp, or ``None`` if ``value`` is invalid
+    """
+    parsed = email.utils.parsedate_tz(value.split(';')[0].strip())
+    if parsed is None:
+        return None
+    else:
+        return email.utils.mktime_tz(parsed)
+
+
 def strip_special(path, special_extensions):
     """Strips special extensions from a file name.
 
@@ -72,8 +213,8 @@ def generate_access_token():
         for _ in range(8))
 
 
-def read(root, filepath, index_files, special_extensions):
-    """Reads a file and guesses the content type.
+def resolve(root, filepath, index_files):
+    """Resolves the path of the file to read for a request.
 
     :param str root: The root path to which `filepath` is a relative path.
 
@@ -82,13 +223,13 @@ def read(root, filepath, index_files, special_extensions):
     :param index_files: The names of index files. These are used if ``path`` is
         a directory.
 
-    :param special_extensions: Extensions to strip when determining the MIME
-        type.
-
-    :return: the tuple ``(headers, body)``
+    :return: the resource path of the file
 
     :raises aiohttp.web.HTTPFound: if ``path`` is a directory, but does not end
         with ``'/'``
+
+    :raises aiohttp.web.HTTPNotFound: if ``path`` is a directory without an
+        index file
     """
     path = os.path.join(root, filepath)
 
@@ -96,22 +237,30 @@ def read(root, filepath, index_files, special_extensions):
     if resource.isdir(path) and path[-1] != '/':
         raise HTTPFound(filepath + '/')
 
-    # Read the file; if a directory is requested, we pick the first matching
-    # index file
+    # If a directory is requested, we pick the first matching index file
     if path[-1] != '/':
-        fullpath = path
+        return path
     else:
         try:
-            fullpath = next(
+            return next(
                 os.path.join(path, index_file)
                 for index_file in index_files
                 if resource.exists(os.path.join(path, index_file)))
         except StopIteration:
             raise HTTPNotFound()
 
-    body = resource.open_stream(fullpath).read()
 
-    # Guess the content type and encoding
+def content_headers(fullpath, special_extensions):
+    """Guesses the content type and encoding of a file.
+
+    :param str fullpath: The resource path of the file, as returned by
+        :func:`resolve`.
+
+    :param special_extensions: Extensions to strip when determining the MIME
+        type.
+
+    :return: the content headers
+    """
     headers = {}
     mimetype, encoding = mimetypes.guess_type(
         strip_special(fullpath, special_extensions))
@@ -120,16 +269,236 @@ def read(root, filepath, index_files, special_extensions):
     if encoding:
         headers['Content-Encoding'] = encoding
 
-    return headers, body
+    return headers
+
+
+def file_digest(path):
+    """Calculates the content hash of a file without reading it all into
+    memory.
+
+    :param str path: The file system path of the file.
+
+    :return: the hexadecimal *SHA-1* digest
+    """
+    digest = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(SENDFILE_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def find_variants(fullpath, headers):
+    """Finds the precompressed variants of a file.
+
+    The variants are expected alongside the file, with the extensions listed
+    in :attr:`PRECOMPRESSED`. Variants older than the file are stale, and
+    are ignored.
+
+    :param str fullpath: The resource path of the file, as returned by
+        :func:`resolve`.
+
+    :param dict headers: The content headers of the file, as returned by
+        :func:`content_headers`.
+
+    :return: a mapping from content encoding to the tuple
+        ``(headers, path)``, where ``path`` is the resource path of the
+        variant
+    """
+    source_mtime = getmtime(fullpath)
+    variants = {}
+    for encoding, extension in PRECOMPRESSED:
+        path = fullpath + '.' + extension
+        if not resource.exists(path):
+            continue
+        variant_mtime = getmtime(path)
+        if source_mtime is not None and variant_mtime is not None \
+                and variant_mtime < source_mtime:
+            continue
+        variants[encoding] = (
+            dict(headers, **{'Content-Encoding': encoding}),
+            path)
+
+    return variants
+
+
+@functools.lru_cache(maxsize=32)
+def accepted_encodings(accept_encoding):
+    """Parses an ``Accept-Encoding`` header.
+
+    :param str accept_encoding: The header value.
+
+    :return: the content encodings accepted
+    :rtype: frozenset
+    """
+    result = set()
+    for item in accept_encoding.split(','):
+        encoding, _, parameters = item.partition(';')
+        try:
+            q = float(parameters.split('q=')[1]) if 'q=' in parameters \
+                else 1.0
+        except ValueError:
+            q = 0.0
+        if q > 0:
+            result.add(encoding.strip().lower())
+
+    return frozenset(result)
+
+
+@functools.lru_cache(maxsize=1)
+def mtime():
+    """Returns the modification time of the resources as a whole.
+
+    We use the modification time of the egg file or the current binary. This
+    is used for files whose own modification time is unknown.
+
+    :return: a modification time
+    """
+    try:
+        st = os.stat(os.path.join(
+            os.path.dirname(__file__),
+            os.path.pardir,
+            os.path.pardir))
+    except OSError:
+        st = os.stat(os.path.abspath(sys.argv[0]))
+    return st.st_mtime
+
+
+def sendfile_path(fullpath):
+    """Returns the file system path to use to send a file directly from the
+    file system.
+
+    Files with precompressed variants alongside them are kept in memory,
+    since :class:`aiohttp.web.FileResponse` would otherwise send a variant of
+    its own choosing instead of the one picked by :func:`respond`.
+
+    :param str fullpath: The resource path of the file.
+
+    :return: a file system path, or ``None`` if the file should be kept in
+        memory
+    """
+    path = resource.filename(fullpath)
+    if path is None or any(
+            os.path.exists(path + '.' + extension)
+            for _, extension in PRECOMPRESSED):
+        return None
+    try:
+        if os.path.getsize(path) >= SENDFILE_SIZE:
+            return path
+    except OSError:
+        pass
+    return None
+
+
+def version(fullpath):
+    """Returns a value identifying the current version of a file.
+
+    For files stored on the file system, this is the modification time and
+    size of the file, so that changes are picked up. Resources in a bundle or
+    package cannot change while the application is running.
+
+    :param str fullpath: The resource path of the file, as returned by
+        :func:`resolve`.
+
+    :return: the tuple ``(mtime, size)``, or ``None`` if the file is not
+        stored on the file system
+    """
+    path = resource.filename(fullpath)
+    if path is None:
+        return None
+    try:
+        st = os.stat(path)
+        return (st.st_mtime, st.st_size)
+    except OSError:
+        return None
+
+
+def getmtime(fullpath):
+    """Returns the current modification time of a file.
+
+    Unlike :func:`virtualtouchpad.resource.getmtime`, this picks up changes to
+    files stored on the file system.
+
+    :param str fullpath: The resource path of the file.
+
+    :return: the modification time, or ``None`` if it cannot be determined
+    """
+    current = version(fullpath)
+    return current[0] if current is not None \
+        else resource.getmtime(fullpath)
+
+
+def load(fullpath, special_extensions, precompressed, version=None):
+    """Loads an asset.
+
+    Files larger than :attr:`SENDFILE_SIZE` stored on the file system are not
+    read into memory.
+
+    See :func:`static` for a description of the parameters.
+
+    :param str fullpath: The resource path of the file, as returned by
+        :func:`resolve`.
+
+    :param version: The version of the file, as returned by :func:`version`.
+
+    :return: an asset
+
+    :raises HTTPNotFound: if the resource does not exist
+    """
+    def asset(headers, fullpath, variants=None):
+        path = sendfile_path(fullpath)
+        body = resource.read(fullpath) if path is None else None
+        return Asset(headers, body, modified, variants, path=path)
+
+    if not resource.exists(fullpath) or resource.isdir(fullpath):
+        raise HTTPNotFound()
+    headers = content_headers(fullpath, special_extensions)
+
+    # Prefer the modification time of the file itself
+    modified = version[0] if version is not None \
+        else resource.getmtime(fullpath) or mtime()
+
+    # Look for precompressed variants only for uncompressed files
+    if precompressed and 'Content-Encoding' not in headers:
+        headers['Vary'] = 'Accept-Encoding'
+        variants = {
+            encoding: asset(variant_headers, variant_path)
+            for encoding, (variant_headers, variant_path)
+            in find_variants(fullpath, headers).items()}
+    else:
+        variants = None
+
+    try:
+        return asset(headers, fullpath, variants)
+    except FileNotFoundError:
+        raise HTTPNotFound()
+
+
+@functools.lru_cache(maxsize=ASSET_CACHE_SIZE)
+def _load(fullpath, special_extensions, precompressed, version):
+    """Loads an asset and keeps it in memory.
+
+    Since ``version`` is part of the cache key, a changed file is loaded
+    again, and the stale asset is eventually evicted.
+
+    See :func:`load` for a description of the parameters.
+    """
+    return load(fullpath, special_extensions, precompressed, version)
 
 
 def static(headers, root, filepath='.', index_files=None,
-           special_extensions=None):
+           special_extensions=None, precompressed=False, fingerprint=None):
     """Reads a static file and returns a response object.
 
     If the file cannot be opened, ``None`` is returned.
 
-    This function honours the ``If-Modified-Since`` header.
+    This function honours the ``If-None-Match`` and ``If-Modified-Since``
+    headers.
+
+    The most recently used files are kept in memory, unless
+    :attr:`IGNORE_CACHED` is set; files stored on the file system are loaded
+    again if their modification time or size changes. Files larger than
+    :attr:`SENDFILE_SIZE` are instead sent directly from the file system, if
+    possible; such responses support range requests.
 
     :param headers: The request headers. These are used to decide whether to
         return ``HTTP 304`` when requesting a file the second time.
@@ -137,7 +506,7 @@ def static(headers, root, filepath='.', index_files=None,
     :param str root: The root path to which `filepath` is a relative path.
 
     :param str filepath: The path of the resource. The resource is read using
-        :func:`virtualtouchpad.resource.open_stream`.
+        :func:`virtualtouchpad.resource.read`.
 
     :param index_files: The names of files to use as index files. These are only
         used if ``filepath`` ends with ``'/'``, which is used to denote a
@@ -146,40 +515,74 @@ def static(headers, root, filepath='.', index_files=None,
     :param special_extensions: Extensions to strip when determining the MIME
         type.
 
+    :param bool precompressed: Whether to look for precompressed variants of
+        the file. If any exist, the one preferred in :attr:`PRECOMPRESSED`
+        and accepted by the client is served.
+
+    :param str fingerprint: The content hash included in the requested file
+        name. If this matches the content of the file, the response may be
+        cached indefinitely.
+
     :return: a response
 
     :raises HTTPNotFound: if the resource does not exist
     """
-    fullroot = os.path.join(ROOT, root)
+    # During development we also make sure to pick up new files
+    if IGNORE_CACHED:
+        resource.refresh()
+
+    # Normalise the path so that equivalent request paths share an asset
+    fullpath = os.path.normpath(resolve(
+        os.path.join(ROOT, root), filepath, index_files or ()))
+    arguments = (fullpath, tuple(special_extensions or ()), precompressed)
+    if IGNORE_CACHED:
+        asset = load(*arguments, version(fullpath))
+    else:
+        asset = _load(*arguments, version(fullpath))
 
-    # Open the file and get its size
-    try:
-        response_headers, body = read(
-            fullroot, filepath, index_files or [], special_extensions or [])
+    return respond(
+        headers, asset,
+        immutable=not IGNORE_CACHED and fingerprint == asset.fingerprint)
 
-    except FileNotFoundError:
-        raise HTTPNotFound()
 
-    response_headers['Content-Length'] = str(len(body))
+def respond(headers, asset, immutable=False):
+    """Creates a response for an asset.
+
+    The preferred variant accepted by the client is sent. This function honours
+    the ``If-None-Match`` and ``If-Modified-Since`` headers.
+
+    :param headers: The request headers.
+
+    :param Asset asset: The asset to send.
+
+    :param bool immutable: Whether the response may be cached indefinitely.
+
+    :return: a response
+    """
+    # Pick the preferred variant accepted by the client
+    if asset.variants:
+        accepted = accepted_encodings(headers.get('accept-encoding', ''))
+        for encoding, _ in PRECOMPRESSED:
+            if encoding in accepted and encoding in asset.variants:
+                asset = asset.variants[encoding]
+                break
+
+    if immutable:
+        response_headers = dict(asset.headers)
+        response_headers['Cache-Control'] = CACHE_CONTROL_IMMUTABLE
+    else:
+        response_headers = asset.headers
+
+    if not IGNORE_CACHED and not asset.is_modified(headers):
+        if immutable:
+            return Response(status=304, headers=dict(
+                asset.not_modified_headers,
+                **{'Cache-Control': CACHE_CONTROL_IMMUTABLE}))
+        else:
+            return Response(status=304, headers=asset.not_modified_headers)
+
+    if asset.path is not None:
+        return _FileResponse(asset.path, headers=response_headers)
+    else:
+        return Response(status=200, body=asset.body, headers=response_headers)
 
-    # Check the file mtime; we use the egg file or the current binary
-    try:
-        st = os.stat(os.path.join(
-            os.path.dirname(__file__),
-            os.path.pardir,
-            os.path.pardir))
-    except OSError:
-        st = os.stat(os.path.abspath(sys.argv[0]))
-    response_headers['Last-Modified'] = email.utils.formatdate(st.st_mtime)
-
-    if not IGNORE_CACHED and headers.get('if-modified-since'):
-        if_modified_since = time.mktime(email.utils.parsedate(
-            headers.get('if-modified-since').split(";")[0].strip()))
-        if if_modified_since is not None \
-                and if_modified_since >= int(st.st_mtime):
-            response_headers['Date'] = time.strftime(
-                '%a, %d %b %Y %H:%M:%S GMT',
-                time.gmtime())
-        return Response(status=304, headers=response_headers)
-
-    return Response(status=200, body=body, headers=response_headers)
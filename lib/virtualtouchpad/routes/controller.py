@@ -15,16 +15,17 @@
 # You should have received a copy of the GNU General Public License along with
 # this program. If not, see <http://www.gnu.org/licenses/>.
 
+import asyncio
 import json
 import logging
 import sys
 
 import aiohttp
 
-from virtualtouchpad.dispatchers import Dispatcher, keyboard, mouse
+from virtualtouchpad import app, protocol
+from virtualtouchpad.dispatchers import Dispatcher, Worker, keyboard, mouse
 
-from . import report_error, websocket
-from ._util import generate_access_token
+from . import qr, report_error, websocket
 
 
 def access_control(app, request):
@@ -36,7 +37,79 @@ def access_control(app, request):
         raise aiohttp.web.HTTPForbidden()
 
 
-@websocket('/controller', access_control)
+def commands(message):
+    """Extracts the commands from a *WebSocket* message.
+
+    A text message is either a *JSON* object with the keys ``command`` and
+    ``data``, or a *JSON* array of such objects. A binary message is decoded
+    with :func:`virtualtouchpad.protocol.decode`.
+
+    :param message: The message received.
+
+    :return: a generator yielding the tuple ``(command, data)`` for every
+        command in the message, in order
+
+    :raises ValueError: if the message is malformed
+    """
+    if message.type == aiohttp.WSMsgType.TEXT:
+        value = json.loads(message.data)
+        for item in value if isinstance(value, list) else (value,):
+            if not isinstance(item['data'], dict):
+                raise ValueError(item['data'])
+            yield item['command'], item['data']
+    else:
+        yield from protocol.decode(message.data)
+
+
+async def start_worker(app):
+    """Starts the worker thread used to dispatch commands.
+
+    :param app: The application.
+    """
+    app['worker'] = Worker(app['server'].configuration.CONTROLLER_COALESCE)
+
+
+async def stop_worker(app):
+    """Stops the worker thread once all queued commands are dispatched.
+
+    The worker is joined in an executor to avoid blocking the event loop.
+
+    :param app: The application.
+    """
+    await asyncio.get_event_loop().run_in_executor(None, app['worker'].stop)
+
+
+async def prewarm_keyboard(app):
+    """Populates the key code cache from the default keyboard layout.
+
+    This is done in the background to not delay startup.
+
+    :param app: The application.
+    """
+    asyncio.get_event_loop().run_in_executor(
+        None,
+        keyboard.prewarm,
+        app['server'].configuration.KEYBOARD_LAYOUT)
+
+
+async def close_controllers(app):
+    """Drops the shared keyboard and mouse controllers.
+
+    This must be called after the worker has been stopped.
+
+    :param app: The application.
+    """
+    keyboard.close()
+    mouse.close()
+
+
+app.on_startup.append(start_worker)
+app.on_startup.append(prewarm_keyboard)
+app.on_cleanup.append(stop_worker)
+app.on_cleanup.append(close_controllers)
+
+
+@websocket('/controller', access_control, (protocol.BINARY,))
 async def controller(app, request, ws):
     log = logging.getLogger(__name__)
     dispatch = Dispatcher(
@@ -45,18 +118,30 @@ async def controller(app, request, ws):
 
     # Invalidate the access token
     if app['server'].configuration.ACCESS_TOKEN:
-        app['server'].configuration.ACCESS_TOKEN = generate_access_token()
-
-    async for message in ws:
-        if message.type == aiohttp.WSMsgType.TEXT:
-            try:
-                dispatch(**json.loads(message.data))
-            except Exception as e:
-                log.exception(
-                    'An error occurred when handling %s',
-                    message)
-                _, _, tb = sys.exc_info()
-                report_error(ws, 'invalid_data', e, tb)
-
-        elif message.type == aiohttp.WSMsgType.ERROR:
-            log.error('WebSocket closed with %s', ws.exception())
+        qr.rotate(app)
+
+    try:
+        async for message in ws:
+            if message.type in (
+                    aiohttp.WSMsgType.TEXT, aiohttp.WSMsgType.BINARY):
+                try:
+                    received = list(commands(message))
+                    for command, data in received:
+                        dispatch.validate(command, data)
+                    await app['worker'].put(dispatch, received)
+                except Exception as e:
+                    log.exception(
+                        'An error occurred when handling %s',
+                        message)
+                    _, _, tb = sys.exc_info()
+                    await report_error(ws, 'invalid_data', e, tb)
+
+            elif message.type == aiohttp.WSMsgType.ERROR:
+                log.error('WebSocket closed with %s', ws.exception())
+
+    finally:
+        # Make sure that nothing remains pressed once the client is gone, even
+        # if this handler fails or is cancelled
+        await app['worker'].put(dispatch, [
+            ('key.release_all', {}),
+            ('mouse.release_all', {})])
@@ -15,6 +15,10 @@
 # You should have received a copy of the GNU General Public License along with
 # this program. If not, see <http://www.gnu.org/licenses/>.
 
+import re
+
+from virtualtouchpad._fingerprint import FINGERPRINT_LENGTH
+
 from ._util import static
 from . import get
 
@@ -28,6 +32,11 @@ ROOT = 'html'
 SPECIAL_EXTENSIONS = (
     'min',)
 
+#: A regular expression matching fingerprinted file names; the groups are the
+#: base name, the content hash and the extension
+FINGERPRINT_RE = re.compile(
+    r'^(.*)\.([0-9a-f]{%d})(\.[^./]+)$' % FINGERPRINT_LENGTH)
+
 #: The files, in the preferred order, to use as index files
 INDEX_FILES = (
     'index.xhtml.min',
@@ -37,9 +46,19 @@ INDEX_FILES = (
 @get('/')
 @get('/{filepath:.*}')
 async def file_resource(app, request, filepath=''):
+    # Fingerprinted file names refer to the file without the content hash
+    match = FINGERPRINT_RE.match(filepath)
+    if match:
+        filepath = match.group(1) + match.group(3)
+        fingerprint = match.group(2)
+    else:
+        fingerprint = None
+
     return static(
         request.headers,
         ROOT,
         filepath,
         INDEX_FILES,
-        SPECIAL_EXTENSIONS)
+        SPECIAL_EXTENSIONS,
+        precompressed=True,
+        fingerprint=fingerprint)
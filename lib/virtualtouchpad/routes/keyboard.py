@@ -15,60 +15,215 @@
 # You should have received a copy of the GNU General Public License along with
 # this program. If not, see <http://www.gnu.org/licenses/>.
 
+import collections
+import functools
+import hashlib
 import json
 import logging
-import os
 
 from aiohttp.web import HTTPNotFound
 
 import virtualtouchpad.resource as resource
 
 from . import get
-from ._util import static
+from ._util import Asset, IGNORE_CACHED, mtime, respond
 
 
 #: The root path for layouts
 ROOT = 'keyboard/layout'
 
+#: The extension of layout files
+EXTENSION = '.layout'
+
+#: The extension appended to compact layout files generated at build time
+COMPACT_EXTENSION = '.min'
+
+#: The content type of layouts and the layout index
+CONTENT_TYPE = 'application/json'
+
+#: The value of ``Cache-Control`` for layouts and the layout index; they are
+#: not fingerprinted, so clients must revalidate them
+CACHE_CONTROL = 'no-cache'
+
+
+class Layout(object):
+    def __init__(self, filename):
+        """A keyboard layout, parsed once and kept serialised.
+
+        If a compact version of the layout has been generated, and it is not
+        older than the source, that is served instead of the source.
+
+        :param str filename: The name of the layout file in :attr:`ROOT`.
+
+        :raises ValueError: if the layout is invalid
+        """
+        path = '%s/%s' % (ROOT, filename)
+        compact_path = path + COMPACT_EXTENSION
+        if is_current(compact_path, path):
+            body = bytes(resource.read(compact_path))
+            data = json.loads(body.decode('utf-8'))
+            modified = resource.getmtime(compact_path)
+        else:
+            data = json.loads(bytes(resource.read(path)).decode('utf-8'))
+            body = json.dumps(data, separators=(',', ':')).encode('utf-8')
+            modified = resource.getmtime(path)
+
+        #: The URL of the layout
+        self.url = '/' + path
+
+        #: The name of the layout
+        self.name = data['meta']['name']
+
+        #: The response body
+        self.body = body
+
+        #: The hash of the response body
+        self.hash = hashlib.sha1(self.body).hexdigest()
+
+        #: The response asset
+        self.asset = asset(self.body, modified)
+
+    @property
+    def description(self):
+        """The description of this layout in the layout index.
+        """
+        return {
+            'url': self.url,
+            'name': self.name,
+            'size': len(self.body),
+            'hash': self.hash}
+
+
+class Registry(object):
+    def __init__(self):
+        """All keyboard layouts, along with the layout index.
+
+        Layouts that fail to load are logged and excluded.
+        """
+        log = logging.getLogger(__name__)
+
+        #: The layouts, keyed on file name, in the order listed
+        self.layouts = collections.OrderedDict()
+        for filename in sorted(resource.list(ROOT)):
+            if not filename.endswith(EXTENSION):
+                continue
+            try:
+                self.layouts[filename] = Layout(filename)
+            except (IOError, KeyError, ValueError):
+                log.exception('Failed to load layout %s', filename)
+
+        #: The response body of the layout index
+        self.index = json.dumps({
+            'layouts': [
+                layout.description
+                for layout in self.layouts.values()]}).encode('utf-8')
+
+        #: The response asset of the layout index
+        self.index_asset = asset(self.index, max(
+            (layout.asset.mtime for layout in self.layouts.values()),
+            default=None))
+
+    def default(self, filename=None):
+        """Returns the default layout.
+
+        :param str filename: The file name of the configured default layout.
+            If this is not specified, or the layout does not exist, the first
+            layout is used.
+
+        :return: a layout, or ``None`` if no layouts exist
+        """
+        # TODO: Select the one used by the current system
+        return self.layouts.get(filename) \
+            or next(iter(self.layouts.values()), None)
+
+
+@functools.lru_cache(maxsize=1)
+def _registry():
+    return Registry()
+
+
+def registry():
+    """Returns the layout registry.
+
+    The registry is created on first use, unless
+    :attr:`virtualtouchpad.routes._util.IGNORE_CACHED` is set, in which case
+    it is recreated for every call.
+
+    :return: the registry
+    :rtype: Registry
+    """
+    if IGNORE_CACHED:
+        resource.refresh()
+        return Registry()
+    else:
+        return _registry()
+
+
+def is_current(compact_path, path):
+    """Determines whether a compact layout exists and is up to date.
+
+    :param str compact_path: The resource path of the compact layout.
+
+    :param str path: The resource path of the layout source.
+
+    :return: whether the compact layout should be used
+    """
+    if not resource.exists(compact_path):
+        return False
+    compact_mtime = resource.getmtime(compact_path)
+    source_mtime = resource.getmtime(path)
+    return compact_mtime is None or source_mtime is None \
+        or compact_mtime >= source_mtime
+
+
+def asset(body, modified):
+    """Creates an asset for a *JSON* body.
+
+    :param bytes body: The response body.
+
+    :param float modified: The modification time of the source. If this is
+        ``None``, the modification time of the resources is used.
+
+    :return: an asset
+    """
+    return Asset(
+        {
+            'Content-Type': CONTENT_TYPE,
+            'Cache-Control': CACHE_CONTROL},
+        body,
+        modified or mtime())
+
 
 @get('/keyboard/layout/default')
 async def default_layout(app, request):
     """Returns the default keyboard layout.
     """
-    layout_files = resource.list(ROOT)
-    if not layout_files:
+    layout = registry().default(
+        app['server'].configuration.KEYBOARD_LAYOUT)
+    if layout is None:
         raise HTTPNotFound()
-
-    # TODO: Select the one used by the current system
-    with resource.open_stream(os.path.join(ROOT, layout_files[0])) as f:
-        return json.loads(f.read().decode('utf-8'))
+    else:
+        return respond(request.headers, layout.asset)
 
 
 @get('/keyboard/layout/')
 async def list_layouts(app, request):
     """Returns a list of all keyboard layouts.
     """
-    layout_files = resource.list(ROOT)
-    if not layout_files:
+    layouts = registry()
+    if not layouts.layouts:
         raise HTTPNotFound()
+    else:
+        return respond(request.headers, layouts.index_asset)
+
 
-    log = logging.getLogger(__name__)
-
-    layouts = []
-    for layout_file in layout_files:
-        path = '%s/%s' % (ROOT, layout_file)
-        try:
-            with resource.open_stream(path) as f:
-                layout = json.loads(f.read().decode('utf-8'))
-                layouts.append({
-                    'url': '/%s' % path,
-                    'name': layout['meta']['name']})
-        except IOError:
-            log.exception('Failed to open %s', path)
-        except ValueError:
-            log.exception('Failed to load JSON value from %s', path)
-        except:
-            log.exception('wha?')
-
-    return {
-        'layouts': layouts}
+@get('/keyboard/layout/{filename}')
+async def layout(app, request, filename):
+    """Returns a keyboard layout.
+    """
+    try:
+        selected = registry().layouts[filename]
+    except KeyError:
+        raise HTTPNotFound()
+    else:
+        return respond(request.headers, selected.asset)
@@ -16,22 +16,244 @@
 # this program. If not, see <http://www.gnu.org/licenses/>.
 
 import io
+import logging
+import threading
 
 from . import get, localhost
 
-import pyqrcode
-
 from aiohttp.web import Response
 
+from virtualtouchpad import app
+from virtualtouchpad.status import Configuration
+
+from ._util import generate_access_token
+
+
+#: The names of the configuration values on which the URL depends
+URL_VALUES = (
+    Configuration.ACCESS_TOKEN.name,
+    Configuration.SERVER_HOST.name,
+    Configuration.SERVER_PORT.name)
+
+#: The width, in modules, of the margin around *PNG* QR codes
+QUIET_ZONE = 4
+
+#: The size, in pixels, of a module in *PNG* QR codes
+PNG_SCALE = 8
+
+
+class Rendered(object):
+    def __init__(self, url):
+        """A QR code for a URL.
+
+        The images are rendered on first access.
+
+        :param str url: The URL to encode.
+        """
+        # pyqrcode is loaded on first use, since it is not required to serve
+        # the touchpad itself; we need at least version 8 for the QR code
+        import pyqrcode
+
+        self.url = url
+        self._code = pyqrcode.create(url, version=8)
+        self._svg = None
+        self._png = None
+
+    @property
+    def svg(self):
+        """The QR code as *SVG*.
+        """
+        if self._svg is None:
+            with io.BytesIO() as stream:
+                self._code.svg(
+                    stream,
+                    background='white',
+                    quiet_zone=QUIET_ZONE,
+                    omithw=True)
+                self._svg = stream.getvalue()
+        return self._svg
+
+    @property
+    def png(self):
+        """The QR code as *PNG*.
+        """
+        if self._png is None:
+            import PIL.Image
+
+            size = len(self._code.code) + 2 * QUIET_ZONE
+            image = PIL.Image.new('1', (size, size), 1)
+            for y, row in enumerate(self._code.code):
+                for x, module in enumerate(row):
+                    if module:
+                        image.putpixel((x + QUIET_ZONE, y + QUIET_ZONE), 0)
+            image = image.resize(
+                (size * PNG_SCALE, size * PNG_SCALE),
+                PIL.Image.NEAREST)
+
+            with io.BytesIO() as stream:
+                image.save(stream, 'PNG')
+                self._png = stream.getvalue()
+        return self._png
+
+    def render(self):
+        """Renders all images.
+
+        Every format is rendered separately; failures are logged, and do not
+        prevent the other formats from being rendered.
+        """
+        for name in ('svg', 'png'):
+            try:
+                getattr(self, name)
+            except Exception as e:
+                logging.getLogger(__name__).warning(
+                    'Failed to render QR code as %s: %s', name, str(e))
+
+
+class Cache(object):
+    def __init__(self, configuration):
+        """A cache of the QR code for the current URL.
+
+        The cached QR code is dropped when any of :attr:`URL_VALUES` is
+        changed.
+
+        To make a new QR code available immediately when the access token is
+        rotated, the next access token and its QR code are prepared in advance
+        by :meth:`prepare`, and swapped in by :meth:`rotate`.
+
+        :param configuration: The server configuration.
+        """
+        self._configuration = configuration
+        self._lock = threading.Lock()
+        self._rendered = None
+        self._next = None
+        notifier = configuration.notifier
+        notifier += self._on_changed
+
+    def close(self):
+        """Stops tracking changes to the configuration.
+        """
+        notifier = self._configuration.notifier
+        notifier -= self._on_changed
+
+    def _on_changed(self, item, value):
+        if item not in URL_VALUES:
+            return
+
+        with self._lock:
+            if self._rendered is not None \
+                    and self._rendered.url != url(self._configuration):
+                self._rendered = None
+            if self._next is not None \
+                    and self._next[1].url != url(
+                        self._configuration, self._next[0]):
+                self._next = None
+
+    @property
+    def current(self):
+        """The QR code for the current URL.
+        """
+        current = url(self._configuration)
+        with self._lock:
+            rendered = self._rendered
+        if rendered is None or rendered.url != current:
+            rendered = Rendered(current)
+            with self._lock:
+                self._rendered = rendered
+        return rendered
+
+    def prepare(self):
+        """Generates the next access token and renders its QR code.
+
+        This method is slow, and should not be called on the event loop.
+        """
+        token = generate_access_token()
+        rendered = Rendered(url(self._configuration, token))
+        rendered.render()
+        with self._lock:
+            self._next = (token, rendered)
+
+    def rotate(self):
+        """Replaces the access token.
 
-def url(configuration):
+        If a token has been prepared, it is used along with its QR code,
+        otherwise a new token is generated.
+        """
+        with self._lock:
+            prepared, self._next = self._next, None
+            if prepared is not None:
+                token, self._rendered = prepared
+        if prepared is None:
+            token = generate_access_token()
+
+        # The notifier must not be called with the lock held
+        self._configuration.ACCESS_TOKEN = token
+
+
+async def create_cache(app):
+    """Creates the QR code cache for the server being started.
+
+    If an access token is required, the next one is prepared in the
+    background.
+
+    :param app: The application.
+    """
+    configuration = app['server'].configuration
+    app['qr'] = Cache(configuration)
+    if configuration.ACCESS_TOKEN:
+        prepare(app)
+
+
+async def close_cache(app):
+    """Detaches the QR code cache from the configuration of the stopped
+    server.
+
+    :param app: The application.
+    """
+    app['qr'].close()
+
+
+app.on_startup.append(create_cache)
+app.on_cleanup.append(close_cache)
+
+
+def rotate(app):
+    """Rotates the access token, and prepares the next one in the background.
+
+    :param app: The application.
+    """
+    app['qr'].rotate()
+    prepare(app)
+
+
+def prepare(app):
+    """Prepares the next access token in the background.
+
+    Failures are logged.
+
+    :param app: The application.
+    """
+    def on_done(future):
+        if not future.cancelled() and future.exception() is not None:
+            logging.getLogger(__name__).error(
+                'Failed to prepare the next access token',
+                exc_info=future.exception())
+
+    app['server'].loop.run_in_executor(
+        None, app['qr'].prepare).add_done_callback(on_done)
+
+
+def url(configuration, access_token=None):
     """Generates the URL to use for connecting.
 
     :param configuration: The server configuration.
 
+    :param str access_token: The access token to include. If this is not
+        specified, the current access token is used.
+
     :return: a URL
     """
-    access_token = configuration.ACCESS_TOKEN
+    if access_token is None:
+        access_token = configuration.ACCESS_TOKEN
     if access_token is None:
         return configuration.SERVER_URL
     else:
@@ -41,18 +263,18 @@ def url(configuration):
 @get('/img/qr.svg')
 @localhost
 async def qr(app, request):
-    # Generate a QR code SVG and save it to a stream; we need at least version 8
-    # for the QR code
-    with io.BytesIO() as stream:
-        pyqrcode.create(
-            url(app['server'].configuration),
-            version=8).svg(
-                stream,
-                background='white',
-                omithw=True)
-
-        return Response(
-            status=200,
-            body=stream.getvalue(),
-            headers={
-                'Content-Type': 'image/svg+xml'})
+    return Response(
+        status=200,
+        body=app['qr'].current.svg,
+        headers={
+            'Content-Type': 'image/svg+xml'})
+
+
+@get('/img/qr.png')
+@localhost
+async def qr_png(app, request):
+    return Response(
+        status=200,
+        body=app['qr'].current.png,
+        headers={
+            'Content-Type': 'image/png'})
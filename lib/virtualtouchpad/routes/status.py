@@ -36,12 +36,18 @@ async def status(app, request):
 async def status_updates(app, request, ws):
     log = logging.getLogger(__name__)
 
+    def on_sent(future):
+        if not future.cancelled() and future.exception() is not None:
+            log.warning(
+                'Failed to send status update: %s', str(future.exception()))
+
     def on_notified(item, value):
-        ws.send_str(json.dumps({
+        asyncio.ensure_future(ws.send_str(json.dumps({
             'item': item,
-            'value': value}))
+            'value': value}))).add_done_callback(on_sent)
 
     with app['server'].configuration.notifier.registered(
-            functools.partial(app.loop.call_soon, on_notified)):
+            functools.partial(
+                app['server'].loop.call_soon_threadsafe, on_notified)):
         async for message in ws:
             log.info('Received status message: %s', message.data)
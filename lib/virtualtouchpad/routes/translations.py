@@ -15,6 +15,7 @@
 # You should have received a copy of the GNU General Public License along with
 # this program. If not, see <http://www.gnu.org/licenses/>.
 
+import functools
 import os
 
 from aiohttp.web import HTTPNotFound
@@ -22,26 +23,97 @@ from aiohttp.web import HTTPNotFound
 import virtualtouchpad.resource as resource
 
 from . import get
-from ._util import static
+from ._util import IGNORE_CACHED, static
 
 #: The root path for translations
 ROOT = 'translations'
 
+#: The extension of translation catalogues
+EXTENSION = '.js'
+
+#: The language used when no requested language is available
+DEFAULT_LANGUAGE = 'default'
+
+
+@functools.lru_cache(maxsize=1)
+def index():
+    """Returns the languages available for every domain.
+
+    :return: a mapping from domain to the languages available
+    :rtype: {str: frozenset}
+    """
+    return {
+        domain: frozenset(
+            name[:-len(EXTENSION)]
+            for name in resource.list(os.path.join(ROOT, domain))
+            if name.endswith(EXTENSION))
+        for domain in resource.list(ROOT)
+        if resource.isdir(os.path.join(ROOT, domain))}
+
+
+@functools.lru_cache(maxsize=32)
+def languages(accept_language):
+    """Parses an ``Accept-Language`` header.
+
+    :param str accept_language: The header value.
+
+    :return: the languages, in order of preference, followed by
+        :attr:`DEFAULT_LANGUAGE`
+    :rtype: tuple
+    """
+    def quality(parameters):
+        try:
+            return float(parameters.split('q=')[1]) if 'q=' in parameters \
+                else 1.0
+        except ValueError:
+            return 0.0
+
+    items = (
+        item.partition(';')
+        for item in accept_language.split(','))
+    return tuple(
+        language
+        for language, q in sorted(
+            (
+                (language.strip(), quality(parameters))
+                for language, _, parameters in items),
+            key=lambda p: p[1],
+            reverse=True)
+        if language) + (DEFAULT_LANGUAGE,)
+
+
+@functools.lru_cache(maxsize=128)
+def resolve(domain, accept_language):
+    """Resolves the catalogue to use for a domain.
+
+    :param str domain: The translation domain.
+
+    :param str accept_language: The value of the ``Accept-Language`` header.
+
+    :return: the path of the catalogue relative to :attr:`ROOT`, or ``None``
+        if no catalogue is available
+    """
+    available = index().get(domain, frozenset())
+    return next(
+        (
+            os.path.join(domain, language + EXTENSION)
+            for language in languages(accept_language)
+            if language in available),
+        None)
+
 
 @get('/translations/{domain}')
 async def translations(app, request, domain):
-    accept_language = request.headers.get('accept-language', 'default')
-    languages = sorted((
-        (
-            language.split(';')[0].strip(),
-            float(language.split(';q=')[1]) if ';q=' in language else 1.0)
-        for language in accept_language.split(',')),
-        key=lambda p: p[1],
-        reverse=True) + [('default', 0.0)]
-
-    for language, q in languages:
-        path = os.path.join(domain, language + '.js')
-        if resource.exists(os.path.join(ROOT, path)):
-            return static(request.headers, ROOT, path)
-
-    raise HTTPNotFound()
+    # During development we make sure to pick up new files
+    if IGNORE_CACHED:
+        resource.refresh()
+        index.cache_clear()
+        resolve.cache_clear()
+
+    path = resolve(
+        domain,
+        request.headers.get('accept-language', DEFAULT_LANGUAGE))
+    if path is None:
+        raise HTTPNotFound()
+    else:
+        return static(request.headers, ROOT, path)
@@ -33,12 +33,33 @@ class Configuration(Store):
     SERVER_PORT = Value(
         'server.port',
         'The port of the server')
+    SERVER_LISTEN = Value(
+        'server.listen',
+        'Additional addresses on which to listen',
+        private=True,
+        default=lambda configuration: [])
+    SERVER_UNIX_SOCKET = Value(
+        'server.unix_socket',
+        'The path of a Unix socket on which to listen',
+        private=True)
+    SERVER_REUSE_PORT = Value(
+        'server.reuse_port',
+        'Whether to allow several processes to listen on the same port',
+        private=True,
+        default=lambda configuration: False)
     SERVER_URL = Value(
         'server.url',
         'The URL of the server',
         default=lambda configuration: 'http://{}:{}/'.format(
             configuration.SERVER_HOST,
             configuration.SERVER_PORT))
+    CONTROLLER_COALESCE = Value(
+        'controller.coalesce',
+        'Whether to merge consecutive mouse movements received together',
+        default=lambda configuration: False)
+    KEYBOARD_LAYOUT = Value(
+        'keyboard.layout',
+        'The file name of the default keyboard layout')
     ACCESS_TOKEN = Value(
         'access.token',
         'The use once access token',
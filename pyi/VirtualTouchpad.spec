@@ -28,7 +28,7 @@ a = Analysis(
     pathex=['pyi'],
     binaries=None,
     datas=[
-        ('../lib/virtualtouchpad/html', 'virtualtouchpad/html')],
+        ('../build/virtualtouchpad.bundle', '.')],
     hiddenimports=[],
     hookspath=[],
     runtime_hooks=[],
@@ -0,0 +1,70 @@
+#!/usr/bin/env python
+
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(
+    os.path.dirname(__file__),
+    os.path.pardir,
+    'lib'))
+from virtualtouchpad.dispatchers import Dispatcher, command
+
+
+#: The number of dispatches per measurement
+NUMBER = 200000
+
+#: The number of measurements; the best one is reported
+REPEAT = 5
+
+
+class Handler(object):
+    """A handler that does nothing, to measure only the dispatching.
+    """
+    @command
+    def move(self, dx=0, dy=0):
+        pass
+
+
+def legacy(handlers):
+    """Creates a dispatch function resolving commands on every call, like
+    :class:`~virtualtouchpad.dispatchers.Dispatcher` used to.
+
+    :param handlers: The handlers.
+
+    :return: a dispatch function
+    """
+    def dispatch(command, data):
+        try:
+            name, method = command.split('.', 1)
+            handler = getattr(handlers[name], method)
+        except ValueError:
+            handler = handlers[command]
+        return handler(**data)
+
+    return dispatch
+
+
+def measure(dispatch):
+    """Measures the time per dispatch of ``mouse.move``.
+
+    :param callable dispatch: The dispatch function.
+
+    :return: the time, in nanoseconds
+    """
+    data = {'dx': 1, 'dy': 1}
+    return min(timeit.repeat(
+        lambda: dispatch('mouse.move', data),
+        number=NUMBER,
+        repeat=REPEAT)) / NUMBER * 1e9
+
+
+def main():
+    before = measure(legacy({'mouse': Handler()}))
+    after = measure(Dispatcher(mouse=Handler()))
+    print('resolved per call: %6.1f ns/dispatch' % before)
+    print('resolved up front: %6.1f ns/dispatch' % after)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,43 @@
+#!/usr/bin/env python
+
+import os
+import subprocess
+import sys
+
+
+#: The library directory
+LIBDIR = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)),
+    os.path.pardir,
+    'lib')
+
+#: The number of measurements; the best one is reported
+REPEAT = 5
+
+
+def measure():
+    """Measures the time to import :mod:`virtualtouchpad.resource` in a new
+    interpreter, excluding the main package.
+
+    :return: the cumulative import time, in microseconds
+    """
+    output = subprocess.check_output(
+        [
+            sys.executable, '-X', 'importtime', '-c',
+            'import virtualtouchpad; import virtualtouchpad.resource'],
+        env=dict(os.environ, PYTHONPATH=LIBDIR),
+        stderr=subprocess.STDOUT).decode('utf-8')
+
+    for line in output.splitlines():
+        if line.startswith('import time:') \
+                and line.split('|')[-1].strip() == 'virtualtouchpad.resource':
+            return int(line.split('|')[1])
+
+
+def main():
+    print('virtualtouchpad.resource: %6d us' % min(
+        measure() for _ in range(REPEAT)))
+
+
+if __name__ == '__main__':
+    main()
@@ -21,7 +21,10 @@ import buildlib
 from buildlib.commands import build_command, CMDCLASS, Command
 from buildlib import ROOT, BUILDDIR, LIBDIR, PDIR
 
+import buildlib.commands.bundle as bundle
+import buildlib.commands.compress as compress
 import buildlib.commands.icons as icons
+import buildlib.commands.layouts as layouts
 import buildlib.commands.minify as minify
 import buildlib.commands.node as node
 import buildlib.commands.translations as translations
@@ -32,7 +35,7 @@ sys.path.append(LIBDIR)
 
 
 REQUIREMENTS = [
-    'aiohttp >=1.2',
+    'aiohttp >=3.0',
     'netifaces >=0.8',
     'Pillow >=1.1.7',
     'pynput >=1.1.3',
@@ -119,9 +122,11 @@ class xgettext(Command):
 
 
 @build_command('generate all resources',
-               minify.minify_html,
                icons.generate_icons,
-               translations.generate_translations)
+               layouts.compile_layouts,
+               minify.minify_html,
+               translations.generate_translations,
+               compress.compress_html)
 class generate_res(Command):
     pass
 
@@ -134,7 +139,8 @@ class build(distutils.command.build.build):
 
 
 @build_command('generate executable',
-               build)
+               build,
+               bundle.generate_bundle)
 class build_exe(Command):
     SPEC_DIR = os.path.join(os.path.dirname(__file__), 'pyi')
 
@@ -0,0 +1,191 @@
+# coding=utf-8
+# virtual-touchpad
+# Copyright (C) 2013-2017 Moses Palmér
+#
+# This program is free software: you can redistribute it and/or modify it under
+# the terms of the GNU General Public License as published by the Free Software
+# Foundation, either version 3 of the License, or (at your option) any later
+# version.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program. If not, see <http://www.gnu.org/licenses/>.
+
+import asyncio
+import threading
+import unittest
+
+from virtualtouchpad.dispatchers import Dispatcher, Worker, command
+
+
+class Handler(object):
+    COALESCABLE = ('move',)
+
+    def __init__(self):
+        self.calls = []
+
+    @command
+    def move(self, dx=0, dy=0):
+        self.calls.append(('move', dx, dy))
+
+    @command
+    def press(self, name):
+        self.calls.append(('press', name))
+
+    @command(internal=True)
+    def reset(self):
+        self.calls.append(('reset',))
+
+    def helper(self):
+        pass
+
+
+class DispatcherTest(unittest.TestCase):
+    def setUp(self):
+        self.handler = Handler()
+        self.dispatcher = Dispatcher(test=self.handler)
+
+    def test_dispatch(self):
+        """Tests that commands are dispatched to the correct handler"""
+        self.dispatcher('test.move', {'dx': 1, 'dy': 2})
+        self.dispatcher('test.press', {'name': 'a'})
+        self.assertEqual(
+            [('move', 1, 2), ('press', 'a')],
+            self.handler.calls)
+
+    def test_unknown(self):
+        """Tests that an unknown command raises KeyError"""
+        with self.assertRaises(KeyError):
+            self.dispatcher('test.unknown', {})
+        with self.assertRaises(KeyError):
+            self.dispatcher.validate('test.unknown', {})
+
+    def test_undecorated(self):
+        """Tests that methods not marked as commands are not dispatched"""
+        with self.assertRaises(KeyError):
+            self.dispatcher('test.helper', {})
+
+    def test_internal(self):
+        """Tests that internal commands are dispatched but not validated"""
+        self.dispatcher('test.reset', {})
+        self.assertEqual([('reset',)], self.handler.calls)
+        with self.assertRaises(KeyError):
+            self.dispatcher.validate('test.reset', {})
+
+    def test_validate(self):
+        """Tests that argument names are validated"""
+        self.dispatcher.validate('test.move', {})
+        self.dispatcher.validate('test.press', {'name': 'a'})
+        with self.assertRaises(TypeError):
+            self.dispatcher.validate('test.press', {})
+        with self.assertRaises(TypeError):
+            self.dispatcher.validate('test.move', {'dz': 1})
+
+    def test_coalesce(self):
+        """Tests that consecutive coalescable commands are merged"""
+        self.assertEqual(
+            [('test.move', {'dx': 3, 'dy': 5})],
+            list(self.dispatcher.coalesce([
+                ('test.move', {'dx': 1, 'dy': 2}),
+                ('test.move', {'dx': 2, 'dy': 3})])))
+
+    def test_coalesce_order(self):
+        """Tests that coalescing does not reorder commands"""
+        self.assertEqual(
+            [
+                ('test.move', {'dx': 1, 'dy': 2}),
+                ('test.press', {'name': 'a'}),
+                ('test.press', {'name': 'a'}),
+                ('test.move', {'dx': 5, 'dy': 7})],
+            list(self.dispatcher.coalesce([
+                ('test.move', {'dx': 1, 'dy': 2}),
+                ('test.press', {'name': 'a'}),
+                ('test.press', {'name': 'a'}),
+                ('test.move', {'dx': 2, 'dy': 3}),
+                ('test.move', {'dx': 3, 'dy': 4})])))
+
+    def test_coalesce_different_arguments(self):
+        """Tests that commands with different arguments are not merged"""
+        commands = [
+            ('test.move', {'dx': 1}),
+            ('test.move', {'dx': 2, 'dy': 3})]
+        self.assertEqual(
+            commands,
+            list(self.dispatcher.coalesce(commands)))
+
+
+class WorkerTest(unittest.TestCase):
+    def setUp(self):
+        self.handler = Handler()
+        self.dispatcher = Dispatcher(test=self.handler)
+
+    def put(self, worker, *batches):
+        loop = asyncio.new_event_loop()
+        try:
+            for batch in batches:
+                loop.run_until_complete(worker.put(self.dispatcher, batch))
+        finally:
+            loop.close()
+
+    def test_order(self):
+        """Tests that queued commands are dispatched in order"""
+        worker = Worker(queue_size=1)
+        self.put(
+            worker,
+            [('test.move', {'dx': 1, 'dy': 2})],
+            [('test.press', {'name': 'a'}), ('test.press', {'name': 'b'})],
+            [('test.move', {'dx': 3, 'dy': 4})])
+        worker.stop()
+        self.assertEqual(
+            [
+                ('move', 1, 2),
+                ('press', 'a'),
+                ('press', 'b'),
+                ('move', 3, 4)],
+            self.handler.calls)
+
+    def test_invalid_command(self):
+        """Tests that an invalid command does not stop the worker"""
+        worker = Worker()
+        self.put(
+            worker,
+            [('invalid', {})],
+            [('test.press', {'name': 'a'})])
+        worker.stop()
+        self.assertEqual(
+            [('press', 'a')],
+            self.handler.calls)
+
+    def test_cancelled(self):
+        """Tests that a put cancelled while the queue is full queues nothing"""
+        dispatched = threading.Event()
+        release = threading.Event()
+        calls = []
+
+        def dispatch(command, data):
+            dispatched.set()
+            release.wait()
+            calls.append(command)
+
+        async def run():
+            await worker.put(dispatch, [('first', {})])
+            await asyncio.get_event_loop().run_in_executor(
+                None, dispatched.wait)
+            blocked = asyncio.ensure_future(
+                worker.put(dispatch, [('second', {})]))
+            await asyncio.sleep(0)
+            self.assertFalse(blocked.done())
+            blocked.cancel()
+            release.set()
+
+        worker = Worker(queue_size=1)
+        loop = asyncio.new_event_loop()
+        try:
+            loop.run_until_complete(run())
+        finally:
+            loop.close()
+        worker.stop()
+        self.assertEqual(['first'], calls)
@@ -0,0 +1,76 @@
+# coding=utf-8
+# virtual-touchpad
+# Copyright (C) 2013-2017 Moses Palmér
+#
+# This program is free software: you can redistribute it and/or modify it under
+# the terms of the GNU General Public License as published by the Free Software
+# Foundation, either version 3 of the License, or (at your option) any later
+# version.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program. If not, see <http://www.gnu.org/licenses/>.
+
+import unittest
+
+from virtualtouchpad import protocol
+
+
+class ProtocolTest(unittest.TestCase):
+    def test_move(self):
+        """Tests that a mouse movement is encoded compactly"""
+        record = protocol.encode('mouse.move', {'dx': 1.5, 'dy': -2.0})
+        self.assertEqual(9, len(record))
+        self.assertEqual(
+            [('mouse.move', {'dx': 1.5, 'dy': -2.0})],
+            list(protocol.decode(record)))
+
+    def test_button(self):
+        """Tests that button names survive a round trip"""
+        for button in protocol.BUTTONS:
+            self.assertEqual(
+                [('mouse.down', {'button': button})],
+                list(protocol.decode(
+                    protocol.encode('mouse.down', {'button': button}))))
+
+    def test_key(self):
+        """Tests that key names are encoded as UTF-8"""
+        data = {'name': 'ä', 'is_dead': True}
+        self.assertEqual(
+            [('key.up', data)],
+            list(protocol.decode(protocol.encode('key.up', data))))
+
+    def test_type(self):
+        """Tests that long strings can be typed"""
+        data = {'text': 'å' * 1000}
+        self.assertEqual(
+            [('key.type', data)],
+            list(protocol.decode(protocol.encode('key.type', data))))
+
+    def test_multiple(self):
+        """Tests that a frame may contain several records"""
+        commands = [
+            ('key.down', {'name': '<shift>', 'is_dead': False}),
+            ('mouse.scroll', {'dx': 0.0, 'dy': 4.0}),
+            ('mouse.up', {'button': 'right'})]
+        self.assertEqual(
+            commands,
+            list(protocol.decode(b''.join(
+                protocol.encode(command, data)
+                for command, data in commands))))
+
+    def test_unknown_opcode(self):
+        """Tests that an unknown opcode raises ValueError"""
+        with self.assertRaises(ValueError):
+            list(protocol.decode(b'\xff'))
+
+    def test_truncated(self):
+        """Tests that a truncated record raises ValueError"""
+        record = protocol.encode('key.down', {'name': 'abc', 'is_dead': False})
+        with self.assertRaises(ValueError):
+            list(protocol.decode(record[:-1]))
+        with self.assertRaises(ValueError):
+            list(protocol.decode(record[:2]))
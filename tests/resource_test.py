@@ -0,0 +1,146 @@
+# coding=utf-8
+# virtual-touchpad
+# Copyright (C) 2013-2017 Moses Palmér
+#
+# This program is free software: you can redistribute it and/or modify it under
+# the terms of the GNU General Public License as published by the Free Software
+# Foundation, either version 3 of the License, or (at your option) any later
+# version.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program. If not, see <http://www.gnu.org/licenses/>.
+
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import unittest
+
+from virtualtouchpad import resource
+
+
+class ResourceTest(unittest.TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp() + os.path.sep
+        self.outside = tempfile.mkdtemp()
+        os.makedirs(os.path.join(self.root, 'a', 'b'))
+        with open(os.path.join(self.root, 'a', 'b', 'c.txt'), 'wb') as f:
+            f.write(b'data')
+        with open(os.path.join(self.outside, 'secret.txt'), 'wb') as f:
+            f.write(b'secret')
+        os.symlink(
+            os.path.join(self.outside, 'secret.txt'),
+            os.path.join(self.root, 'a', 'secret.txt'))
+
+        self.manifest = resource._build_from_directory(self.root)
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+        shutil.rmtree(self.outside)
+
+    def test_files(self):
+        """Tests that files are listed with their sizes"""
+        entry = self.manifest['a/b/c.txt']
+        self.assertEqual(4, entry.size)
+        self.assertIsNone(entry.children)
+
+    def test_directories(self):
+        """Tests that directories are listed with their children"""
+        self.assertEqual(['a'], self.manifest[''].children)
+        self.assertEqual(['b'], self.manifest['a'].children)
+
+    def test_outside(self):
+        """Tests that files outside of the root are excluded"""
+        self.assertNotIn('a/secret.txt', self.manifest)
+
+    def test_key(self):
+        """Tests that resource paths are normalised"""
+        self.assertEqual('', resource._key('.'))
+        self.assertEqual('a/b', resource._key('./a/b/'))
+        self.assertEqual('a/c.txt', resource._key('a/b/../c.txt'))
+        self.assertEqual('../a', resource._key('../a'))
+
+
+class BundleTest(unittest.TestCase):
+    FILES = {
+        'a/b/c.txt': b'data',
+        'a/d.txt': b'more data',
+        'e.txt': b''}
+
+    def setUp(self):
+        index = {}
+        data = b''
+        for path, content in sorted(self.FILES.items()):
+            index[path] = [len(data), len(content), 1.0]
+            data += content
+        header = json.dumps(index).encode('utf-8')
+
+        fd, self.path = tempfile.mkstemp()
+        with os.fdopen(fd, 'wb') as f:
+            f.write(resource.BUNDLE_MAGIC)
+            f.write(resource.BUNDLE_HEADER.pack(len(header)))
+            f.write(header)
+            f.write(data)
+
+        self.bundle = resource.Bundle(self.path)
+        self.manifest = resource._build_from_bundle(self.bundle)
+
+    def tearDown(self):
+        os.unlink(self.path)
+
+    def test_read(self):
+        """Tests that files are read from the bundle"""
+        for path, content in self.FILES.items():
+            self.assertEqual(content, self.bundle.read(path))
+
+    def test_directories(self):
+        """Tests that directories are derived from the file paths"""
+        self.assertEqual(['a', 'e.txt'], self.manifest[''].children)
+        self.assertEqual(['b', 'd.txt'], self.manifest['a'].children)
+        self.assertEqual(['c.txt'], self.manifest['a/b'].children)
+
+    def test_invalid(self):
+        """Tests that files which are not bundles are rejected"""
+        with open(self.path, 'wb') as f:
+            f.write(b'not a bundle')
+        with self.assertRaises(ValueError):
+            resource.Bundle(self.path)
+
+
+@unittest.skipIf(sys.version_info < (3, 7), '-X importtime is not supported')
+class ImportTimeTest(unittest.TestCase):
+    def import_times(self):
+        """Imports :mod:`virtualtouchpad.resource` in a new interpreter.
+
+        :return: a mapping from module name to cumulative import time, in
+            microseconds
+        """
+        output = subprocess.check_output(
+            [
+                sys.executable, '-X', 'importtime', '-c',
+                'import virtualtouchpad; import virtualtouchpad.resource'],
+            env=dict(os.environ, PYTHONPATH=os.pathsep.join(sys.path)),
+            stderr=subprocess.STDOUT).decode('utf-8')
+
+        result = {}
+        for line in output.splitlines():
+            if not line.startswith('import time:'):
+                continue
+            try:
+                self_time, cumulative, name = line.split(':', 1)[1].split('|')
+                result[name.strip()] = int(cumulative)
+            except ValueError:
+                pass
+        return result
+
+    def test_no_pkg_resources(self):
+        """Tests that pkg_resources is not imported when not required"""
+        if resource.STATIC_ROOT is None and resource.BUNDLE is None:
+            self.skipTest('resources are read using pkg_resources')
+        self.assertNotIn('pkg_resources', self.import_times())
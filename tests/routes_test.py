@@ -0,0 +1,228 @@
+# coding=utf-8
+# virtual-touchpad
+# Copyright (C) 2013-2017 Moses Palmér
+#
+# This program is free software: you can redistribute it and/or modify it under
+# the terms of the GNU General Public License as published by the Free Software
+# Foundation, either version 3 of the License, or (at your option) any later
+# version.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program. If not, see <http://www.gnu.org/licenses/>.
+
+import asyncio
+import email.utils
+import gzip
+import hashlib
+import os
+import shutil
+import tempfile
+import types
+import unittest
+
+from aiohttp import web
+from aiohttp.test_utils import TestClient, TestServer
+from multidict import CIMultiDict
+
+# The routes import the input controllers, which require a display unless the
+# dummy backend is used
+os.environ.setdefault('PYNPUT_BACKEND', 'dummy')
+
+from virtualtouchpad import app, resource, routes
+from virtualtouchpad.routes import _util
+from virtualtouchpad.status import Configuration
+
+
+class AssetTest(unittest.TestCase):
+    #: The modification time of the asset
+    MTIME = 1500000000
+
+    def setUp(self):
+        self.asset = _util.Asset(
+            {'Content-Type': 'text/plain'}, b'content', self.MTIME)
+
+    def is_modified(self, **headers):
+        return self.asset.is_modified(CIMultiDict(
+            (key.replace('_', '-'), value)
+            for key, value in headers.items()))
+
+    def date(self, offset):
+        return email.utils.formatdate(self.MTIME + offset, usegmt=True)
+
+    def test_unconditional(self):
+        """Tests that an unconditional request is modified"""
+        self.assertTrue(self.is_modified())
+
+    def test_modified_since_older(self):
+        """Tests that a date older than the asset is modified"""
+        self.assertTrue(self.is_modified(if_modified_since=self.date(-1)))
+
+    def test_modified_since_equal(self):
+        """Tests that the date of the asset is not modified"""
+        self.assertFalse(self.is_modified(if_modified_since=self.date(0)))
+
+    def test_modified_since_newer(self):
+        """Tests that a date newer than the asset is not modified"""
+        self.assertFalse(self.is_modified(if_modified_since=self.date(1)))
+
+    def test_modified_since_invalid(self):
+        """Tests that an invalid date is modified"""
+        self.assertTrue(self.is_modified(if_modified_since='invalid'))
+
+    def test_none_match(self):
+        """Tests that a matching entity tag is not modified"""
+        self.assertFalse(self.is_modified(if_none_match=self.asset.etag))
+
+    def test_none_match_other(self):
+        """Tests that an entity tag for other content is modified"""
+        self.assertTrue(self.is_modified(if_none_match='"other"'))
+
+    def test_none_match_list(self):
+        """Tests that an entity tag in a list is not modified"""
+        self.assertFalse(self.is_modified(
+            if_none_match='"other", %s' % self.asset.etag))
+
+    def test_none_match_weak(self):
+        """Tests that a matching weak entity tag is not modified"""
+        self.assertFalse(self.is_modified(
+            if_none_match='W/' + self.asset.etag))
+
+    def test_none_match_any(self):
+        """Tests that * is not modified"""
+        self.assertFalse(self.is_modified(if_none_match='*'))
+
+    def test_none_match_precedence(self):
+        """Tests that If-None-Match overrides If-Modified-Since"""
+        self.assertTrue(self.is_modified(
+            if_none_match='"other"',
+            if_modified_since=self.date(1)))
+        self.assertFalse(self.is_modified(
+            if_none_match=self.asset.etag,
+            if_modified_since=self.date(-1)))
+
+
+class HeaderTest(unittest.TestCase):
+    def test_entity_tags(self):
+        """Tests that entity tags are parsed and weak tags made strong"""
+        self.assertEqual(
+            frozenset(('"a"', '"b"', '*')),
+            _util.entity_tags(' "a",W/"b" , *,'))
+
+    def test_http_date(self):
+        """Tests that an HTTP date is parsed"""
+        self.assertEqual(
+            1500000000,
+            _util.http_date('Fri, 14 Jul 2017 02:40:00 GMT'))
+
+    def test_http_date_length(self):
+        """Tests that the legacy length parameter is ignored"""
+        self.assertEqual(
+            1500000000,
+            _util.http_date('Fri, 14 Jul 2017 02:40:00 GMT; length=10'))
+
+    def test_http_date_invalid(self):
+        """Tests that an invalid HTTP date is None"""
+        self.assertIsNone(_util.http_date('invalid'))
+
+
+class StaticTest(unittest.TestCase):
+    #: The content of the large file
+    DATA = b'<svg>' + b' ' * _util.SENDFILE_SIZE + b'</svg>'
+
+    def setUp(self):
+        self.static_root = resource.STATIC_ROOT
+        self.root = tempfile.mkdtemp() + os.path.sep
+        os.makedirs(os.path.join(self.root, 'html', 'img'))
+        path = os.path.join(self.root, 'html', 'img', 'big.svg')
+        with open(path, 'wb') as f:
+            f.write(self.DATA)
+        with open(path + '.gz', 'wb') as f:
+            f.write(gzip.compress(self.DATA))
+        st = os.stat(path)
+        os.utime(path + '.gz', (st.st_atime, st.st_mtime))
+
+        resource.STATIC_ROOT = self.root
+        resource.refresh()
+
+    def tearDown(self):
+        resource.STATIC_ROOT = self.static_root
+        resource.refresh()
+        shutil.rmtree(self.root)
+
+    def get(self, path, **headers):
+        """Requests a static file.
+
+        :param str path: The path of the file below ``html``.
+
+        :return: the tuple ``(response, body)``
+        """
+        async def handler(request):
+            return _util.static(
+                request.headers, 'html', path, precompressed=True)
+
+        async def get():
+            app = web.Application()
+            app.router.add_get('/', handler)
+            async with TestClient(
+                    TestServer(app), auto_decompress=False) as client:
+                response = await client.get('/', headers=headers)
+                return response, await response.read()
+
+        loop = asyncio.new_event_loop()
+        try:
+            return loop.run_until_complete(get())
+        finally:
+            loop.close()
+
+    def test_identity(self):
+        """Tests that refusing compression sends the uncompressed file"""
+        response, body = self.get(
+            'img/big.svg', **{'Accept-Encoding': 'gzip;q=0, identity'})
+        self.assertEqual(self.DATA, body)
+        self.assertNotIn('Content-Encoding', response.headers)
+        self.assertEqual(
+            '"%s"' % hashlib.sha1(self.DATA).hexdigest(),
+            response.headers['ETag'])
+
+    def test_gzip(self):
+        """Tests that the precompressed file is sent if accepted"""
+        response, body = self.get(
+            'img/big.svg', **{'Accept-Encoding': 'gzip'})
+        self.assertEqual(self.DATA, gzip.decompress(body))
+        self.assertEqual('gzip', response.headers['Content-Encoding'])
+        self.assertEqual(
+            '"%s"' % hashlib.sha1(body).hexdigest(),
+            response.headers['ETag'])
+
+
+class LocalRequestTest(unittest.TestCase):
+    def setUp(self):
+        app['server'] = types.SimpleNamespace(configuration=Configuration(**{
+            Configuration.SERVER_HOST.name: '127.0.0.2',
+            Configuration.SERVER_PORT.name: 16080,
+            Configuration.SERVER_LISTEN.name: ['127.0.0.1'],
+            Configuration.ACCESS_TOKEN.name: 'SECRET12'}))
+
+    def tearDown(self):
+        del app['server']
+
+    def is_local_request(self, peername):
+        return routes.is_local_request(types.SimpleNamespace(
+            transport=types.SimpleNamespace(
+                get_extra_info=lambda name: peername)))
+
+    def test_server_host(self):
+        """Tests that a request from the server host is local"""
+        self.assertTrue(self.is_local_request(('127.0.0.2', 50000)))
+
+    def test_proxied(self):
+        """Tests that a request forwarded by a local proxy is not local"""
+        self.assertFalse(self.is_local_request(('127.0.0.1', 50000)))
+
+    def test_unix_socket(self):
+        """Tests that a request over a Unix socket is not local"""
+        self.assertFalse(self.is_local_request(''))